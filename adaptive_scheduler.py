@@ -0,0 +1,65 @@
+import threading
+from collections import deque
+
+
+# 默认调度设置，可在config.json的"scheduler"中覆盖
+DEFAULT_SCHEDULER_SETTINGS = {
+    "initial_interval": 5.0,   # 初始间隔(秒)
+    "min_interval": 1.0,       # 最短间隔(秒)
+    "max_interval": 30.0,      # 最长间隔(秒)
+    "static_threshold": 8.0,   # 低于此变化值视为静止画面
+    "active_threshold": 25.0,  # 高于此变化值视为激烈画面
+    "backoff": 1.5,            # 静止时的退避倍数
+    "speedup": 0.5,            # 激烈时的缩短倍数
+    "latency_window": 20,      # 统计API延迟的请求数
+}
+
+
+class AdaptiveScheduler:
+    """自适应监控间隔
+
+    画面变化大时缩短间隔，画面静止时按指数退避延长间隔，
+    且间隔不会短于最近API请求延迟的中位数(p50)。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_SCHEDULER_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._latencies = deque(maxlen=int(self.settings["latency_window"]))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """恢复初始间隔"""
+        with self._lock:
+            self.interval = self._clamp(float(self.settings["initial_interval"]))
+
+    def _clamp(self, interval):
+        return min(float(self.settings["max_interval"]), max(float(self.settings["min_interval"]), interval))
+
+    def record_change(self, score):
+        """记录画面变化程度 (0-255)"""
+        with self._lock:
+            if score >= self.settings["active_threshold"]:
+                self.interval = self._clamp(self.interval * self.settings["speedup"])
+            elif score < self.settings["static_threshold"]:
+                self.interval = self._clamp(self.interval * self.settings["backoff"])
+
+    def record_latency(self, seconds):
+        """记录一次API请求耗时"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def latency_p50(self):
+        """最近API请求耗时的中位数"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        return latencies[len(latencies) // 2]
+
+    def next_interval(self):
+        """下一次截图前的等待时间"""
+        return max(self.interval, self.latency_p50())
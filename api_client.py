@@ -0,0 +1,300 @@
+import json
+import threading
+import time
+from urllib.parse import urlparse
+
+from lazy_import import lazy_import
+from metrics import get_metrics
+from rate_limiter import RateLimiter, parse_retry_after
+
+requests = lazy_import("requests")
+
+
+# 默认HTTP设置，可在config.json的"http"中覆盖
+DEFAULT_HTTP_SETTINGS = {
+    "pool_size": 4,          # 每个主机的连接池大小
+    "keep_alive": True,      # 是否复用连接
+    "connect_timeout": 5,    # 连接超时(秒)
+    "read_timeout": 60,      # 读取超时(秒)
+    "warm_up": True,         # 启动时预热连接
+}
+
+
+class APIError(Exception):
+    """API返回非200状态"""
+
+    def __init__(self, status_code, text="", retry_after=None):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+        self.text = text
+        self.retry_after = retry_after  # 服务商要求的等待时间(秒)
+
+    @classmethod
+    def from_response(cls, response):
+        return cls(response.status_code, response.text, parse_retry_after(response.headers.get("Retry-After")))
+
+
+class CircuitOpenError(APIError):
+    """服务商熔断中或等待限流超时，未发送请求"""
+
+    def __init__(self, provider, retry_in=0.0):
+        super().__init__(503, f"{provider} 暂时不可用，{retry_in:.0f}秒后重试", retry_in)
+        self.provider = provider
+
+
+def estimate_request_tokens(data):
+    """粗略估算一次请求消耗的token数（用于每分钟token限额）"""
+    tokens = int(data.get("max_tokens") or 0)
+    for message in data.get("messages", []):
+        content = message.get("content")
+        parts = content if isinstance(content, list) else [{"type": "text", "text": content or ""}]
+        for part in parts:
+            if part.get("type") == "image_url":
+                tokens += 1000
+            else:
+                tokens += len(part.get("text") or "") // 2
+    return tokens
+
+
+class APIClient:
+    """模型API客户端
+
+    所有API调用共用一个带连接池的 requests.Session，避免每次请求
+    重新进行TCP+TLS握手。连接池本身是线程安全的，可在多个线程中使用。
+    Session在第一次请求时才创建，启动时不必加载requests。
+    """
+
+    def __init__(self, settings=None, rate_limit=None):
+        self.settings = dict(DEFAULT_HTTP_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        # 按服务商/模型限流、重试和熔断
+        self.limiter = RateLimiter(rate_limit)
+
+        self._session = None
+        self._session_lock = threading.Lock()
+
+        self.last_timing = None
+        self.metrics = get_metrics()
+
+    @property
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                pool_size = int(self.settings["pool_size"])
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                if not self.settings["keep_alive"]:
+                    session.headers["Connection"] = "close"
+                self._session = session
+            return self._session
+
+    @property
+    def timeout(self):
+        """(连接超时, 读取超时)"""
+        return (float(self.settings["connect_timeout"]), float(self.settings["read_timeout"]))
+
+    def request(self, method, url, **kwargs):
+        """发送请求，未指定超时时使用默认超时"""
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    @staticmethod
+    def provider_of(url):
+        return urlparse(url).netloc
+
+    def is_available(self, url):
+        """服务商是否未处于熔断状态"""
+        return not self.limiter.is_open(self.provider_of(url))
+
+    def _call_with_retry(self, url, data, call):
+        """限流后调用call()，临时错误按Retry-After或指数退避重试"""
+        provider = self.provider_of(url)
+        model = data.get("model", "")
+        breaker = self.limiter.breaker(provider)
+        max_retries = int(self.limiter.settings["max_retries"])
+        tokens = estimate_request_tokens(data)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self.metrics.inc("circuit_rejected")
+                raise CircuitOpenError(provider, breaker.remaining())
+            if not self.limiter.acquire(provider, model, tokens):
+                # 没有发出请求，归还可能已占用的试探名额
+                breaker.release()
+                self.metrics.inc("rate_limited")
+                raise CircuitOpenError(provider, self.limiter.settings["max_wait"])
+
+            try:
+                result = call()
+            except APIError as e:
+                if not self.limiter.should_retry(e.status_code):
+                    # 客户端错误不能说明服务商是否恢复
+                    breaker.release()
+                    raise
+                error, delay = e, e.retry_after
+                if e.retry_after is not None:
+                    self.limiter.block(provider, model, e.retry_after)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, delay = e, None
+            except _PartialStreamError as e:
+                # 已经输出了部分内容，重试会重复显示
+                breaker.record_failure()
+                raise e.error
+            except BaseException:
+                # 被放弃的对冲请求等，没有结果
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+                return result
+
+            breaker.record_failure()
+            if attempt >= max_retries:
+                raise error
+            if delay is None:
+                delay = self.limiter.backoff(attempt)
+            attempt += 1
+            self.metrics.inc("retries")
+            print(f"请求失败({error})，{delay:.1f}秒后第{attempt}次重试")
+            time.sleep(delay)
+
+    def stream_completion(self, url, headers, data, on_token=None):
+        """以SSE流式方式请求补全，每收到一段文本调用on_token，返回完整文本"""
+        return self._call_with_retry(url, data, lambda: self._stream_once(url, headers, data, on_token))
+
+    def _stream_once(self, url, headers, data, on_token):
+        payload = dict(data)
+        payload["stream"] = True
+
+        start = time.perf_counter()
+        first_token_time = None
+        parse_time = 0.0
+        parts = []
+
+        self.metrics.inc("requests")
+        with self.post(url, headers=headers, json=payload, stream=True) as response:
+            if response.status_code != 200:
+                self.metrics.inc("request_errors")
+                raise APIError.from_response(response)
+
+            # SSE默认按UTF-8解码
+            response.encoding = "utf-8"
+            lines = response.iter_lines(chunk_size=None, decode_unicode=True)
+            for line in _guard_partial(lines, parts):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = line[5:].strip()
+                if chunk == "[DONE]":
+                    break
+                parse_start = time.perf_counter()
+                try:
+                    event = json.loads(chunk)
+                    delta = event["choices"][0].get("delta") or {}
+                except (ValueError, KeyError, IndexError):
+                    continue
+                finally:
+                    parse_time += time.perf_counter() - parse_start
+
+                token = delta.get("content")
+                if not token:
+                    continue
+                if first_token_time is None:
+                    first_token_time = time.perf_counter() - start
+                parts.append(token)
+                if on_token:
+                    on_token(token)
+
+        total_time = time.perf_counter() - start
+        self.last_timing = {
+            "ttft_ms": (first_token_time or total_time) * 1000,
+            "total_ms": total_time * 1000,
+        }
+        self.metrics.observe("http", total_time - parse_time)
+        self.metrics.observe("json_parse", parse_time)
+        if first_token_time is not None:
+            self.metrics.observe("ttft", first_token_time)
+        print(f"流式请求耗时: 首字 {self.last_timing['ttft_ms']:.0f}ms / 总计 {self.last_timing['total_ms']:.0f}ms")
+        return "".join(parts)
+
+    def complete(self, url, headers, data):
+        """非流式请求补全，返回完整文本"""
+        return self._call_with_retry(url, data, lambda: self._complete_once(url, headers, data))
+
+    def _complete_once(self, url, headers, data):
+        self.metrics.inc("requests")
+        start = time.perf_counter()
+        with self.metrics.span("http"):
+            response = self.post(url, headers=headers, json=data)
+        if response.status_code != 200:
+            self.metrics.inc("request_errors")
+            raise APIError.from_response(response)
+        with self.metrics.span("json_parse"):
+            content = response.json()["choices"][0]["message"]["content"]
+
+        total_time = time.perf_counter() - start
+        self.last_timing = {"ttft_ms": total_time * 1000, "total_ms": total_time * 1000}
+        print(f"请求耗时: 总计 {self.last_timing['total_ms']:.0f}ms")
+        return content
+
+    def warm_up(self, url, headers=None):
+        """在后台预先建立到服务商的连接"""
+        if not self.settings["warm_up"]:
+            return
+
+        def run():
+            try:
+                self.get(url, headers=headers, timeout=self.timeout[0] * 2).close()
+            except Exception as e:
+                print(f"连接预热失败: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def close(self):
+        """关闭连接池"""
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+class _PartialStreamError(Exception):
+    """流式输出中途断开"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+def _guard_partial(lines, parts):
+    """已收到内容后连接断开时改为抛出_PartialStreamError，避免重试"""
+    try:
+        for line in lines:
+            yield line
+    except (requests.ConnectionError, requests.Timeout) as e:
+        if parts:
+            raise _PartialStreamError(e)
+        raise
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_api_client(settings=None, rate_limit=None):
+    """获取进程内共享的API客户端"""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = APIClient(settings, rate_limit)
+        return _shared_client
@@ -0,0 +1,269 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from api_client import APIError
+from lazy_import import lazy_import
+
+requests = lazy_import("requests")
+
+
+# 默认故障转移设置，可在config.json的"failover"中覆盖
+DEFAULT_FAILOVER_SETTINGS = {
+    "hedge": False,             # 主服务超过p95延迟仍无响应时，向下一个服务发送对冲请求
+    "hedge_percentile": 0.95,   # 触发对冲的延迟分位数
+    "hedge_min_delay": 0.5,     # 对冲等待下限(秒)
+    "hedge_initial_delay": 3.0, # 延迟样本不足时的对冲等待(秒)
+    "min_samples": 5,           # 计算分位数所需的最少样本数
+    "latency_window": 50,       # 每个服务保留的延迟样本数
+    "unhealthy_failures": 3,    # 连续失败多少次后排到队尾
+}
+
+
+class Backend:
+    """一个OpenAI兼容的服务"""
+
+    def __init__(self, name, base_url, api_key="", model="", window=50):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.model = model
+        self.latencies = deque(maxlen=window)  # 首次响应耗时(秒)
+        self.failures = 0
+        self.wins = 0
+        self.errors = 0
+
+    def latency_quantile(self, q):
+        if not self.latencies:
+            return None
+        data = sorted(self.latencies)
+        return data[min(len(data) - 1, int(q * len(data)))]
+
+
+class _Abandoned(Exception):
+    """对冲请求中落后的一方被放弃"""
+
+
+class _PartialOutput(Exception):
+    """已经输出部分内容后请求失败，换服务重试会重复显示"""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+class BackendPool:
+    """按顺序排列的多个服务，支持自动故障转移和对冲请求
+
+    call(backend, on_token) 对指定服务发起一次请求并返回完整文本。
+    """
+
+    def __init__(self, backends, settings=None, is_available=None):
+        self.settings = dict(DEFAULT_FAILOVER_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.is_available = is_available or (lambda backend: True)
+
+        self._lock = threading.Lock()
+        self.backends = []
+        self.configure(backends)
+        self.requests = 0
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def configure(self, backends):
+        """更新服务列表，保留同名服务的统计"""
+        with self._lock:
+            old = {b.name: b for b in self.backends}
+            updated = []
+            for i, item in enumerate(backends):
+                name = item.get('name') or f"backend{i + 1}"
+                backend = old.get(name)
+                if backend is None or backend.base_url != item['base_url'].rstrip('/'):
+                    backend = Backend(name, item['base_url'], window=int(self.settings["latency_window"]))
+                backend.api_key = item.get('api_key', '')
+                backend.model = item.get('model', '')
+                updated.append(backend)
+            self.backends = updated
+
+    def healthy(self, backend):
+        return backend.failures < self.settings["unhealthy_failures"] and self.is_available(backend)
+
+    def ordered(self):
+        """健康的服务在前，其余按原顺序排在后面"""
+        with self._lock:
+            backends = list(self.backends)
+        return sorted(backends, key=lambda b: not self.healthy(b))
+
+    def hedge_delay(self, backend):
+        """等待多久后发送对冲请求"""
+        if len(backend.latencies) < self.settings["min_samples"]:
+            return self.settings["hedge_initial_delay"]
+        return max(self.settings["hedge_min_delay"], backend.latency_quantile(self.settings["hedge_percentile"]))
+
+    def _record(self, backend, latency=None, error=None):
+        with self._lock:
+            if error is None:
+                backend.failures = 0
+                backend.wins += 1
+                if latency is not None:
+                    backend.latencies.append(latency)
+            else:
+                backend.failures += 1
+                backend.errors += 1
+
+    def execute(self, call, on_token=None):
+        """发送请求，失败时依次切换到下一个服务"""
+        backends = self.ordered()
+        if not backends:
+            raise APIError(0, "未配置任何服务")
+        with self._lock:
+            self.requests += 1
+        if self.settings["hedge"] and len(backends) > 1:
+            return self._hedged(backends, call, on_token)
+        return self._failover(backends, call, on_token)
+
+    def _attempt(self, backend, call, on_token, claim=None):
+        """对一个服务发送请求，返回(文本, 首次响应耗时)"""
+        start = time.perf_counter()
+        first = []
+
+        def token(text):
+            if not first:
+                first.append(time.perf_counter() - start)
+            if claim and not claim():
+                raise _Abandoned()
+            on_token(text)
+
+        try:
+            content = call(backend, token if on_token else None)
+        except (APIError, requests.RequestException) as e:
+            if first and on_token:
+                raise _PartialOutput(e)
+            raise
+        return content, first[0] if first else time.perf_counter() - start
+
+    def _failover(self, backends, call, on_token):
+        error = None
+        for i, backend in enumerate(backends):
+            try:
+                content, latency = self._attempt(backend, call, on_token)
+            except _PartialOutput as e:
+                self._record(backend, error=e.error)
+                raise e.error
+            except (APIError, requests.RequestException) as e:
+                error = e
+                self._record(backend, error=e)
+                if i + 1 < len(backends):
+                    print(f"{backend.name} 请求失败({e})，切换到 {backends[i + 1].name}")
+                continue
+            self._record(backend, latency)
+            if i > 0:
+                with self._lock:
+                    self.failovers += 1
+            return content
+        raise error
+
+    def _hedged(self, backends, call, on_token):
+        results = queue.Queue()
+        winner = []
+        claim_lock = threading.Lock()
+
+        def claim(index):
+            # 第一个产生输出(或完成)的请求胜出，其余的被放弃
+            with claim_lock:
+                if not winner:
+                    winner.append(index)
+                return winner[0] == index
+
+        def run(index, backend):
+            try:
+                content, latency = self._attempt(backend, call, on_token, lambda: claim(index))
+                results.put((index, backend, content, latency, None))
+            except Exception as e:
+                results.put((index, backend, None, None, e))
+
+        def launch(index):
+            threading.Thread(target=run, args=(index, backends[index]), daemon=True).start()
+
+        launch(0)
+        launched = 1
+        pending = 1
+        hedged = False
+        hedge_at = time.monotonic() + self.hedge_delay(backends[0])
+        error = None
+
+        while pending:
+            timeout = None
+            if hedge_at is not None and launched == 1 and launched < len(backends):
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                index, backend, content, latency, exc = results.get(timeout=timeout)
+            except queue.Empty:
+                # 主服务超过p95仍无响应，向下一个服务发送对冲请求
+                if not winner:
+                    print(f"{backends[0].name} 响应较慢，向 {backends[launched].name} 发送对冲请求")
+                    with self._lock:
+                        self.hedges += 1
+                    launch(launched)
+                    launched += 1
+                    pending += 1
+                    hedged = True
+                else:
+                    hedge_at = None
+                continue
+
+            pending -= 1
+            if exc is None and claim(index):
+                self._record(backend, latency)
+                with self._lock:
+                    if hedged and index == 1:
+                        self.hedge_wins += 1
+                    elif index > 0:
+                        self.failovers += 1
+                return content
+            if isinstance(exc, _Abandoned) or exc is None:
+                continue
+            if isinstance(exc, _PartialOutput):
+                # 胜出的请求输出部分内容后失败，不再切换服务
+                self._record(backend, error=exc.error)
+                raise exc.error
+
+            error = exc
+            self._record(backend, error=exc)
+            # 失败时立即切换到下一个尚未使用的服务
+            if launched < len(backends) and not winner:
+                print(f"{backend.name} 请求失败({exc})，切换到 {backends[launched].name}")
+                launch(launched)
+                launched += 1
+                pending += 1
+            hedge_at = None
+
+        raise error or APIError(0, "所有服务均请求失败")
+
+    def get_stats(self):
+        """各服务的胜出次数、错误和延迟，以及对冲统计"""
+        with self._lock:
+            backends = list(self.backends)
+            requests_total = self.requests
+            stats = {
+                "requests": requests_total,
+                "failovers": self.failovers,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedges / requests_total if requests_total else 0.0,
+                "hedge_win_rate": self.hedge_wins / self.hedges if self.hedges else 0.0,
+            }
+        stats["backends"] = {
+            b.name: {
+                "wins": b.wins,
+                "win_rate": b.wins / requests_total if requests_total else 0.0,
+                "errors": b.errors,
+                "healthy": self.healthy(b),
+                "p95_ms": (b.latency_quantile(0.95) or 0.0) * 1000,
+            }
+            for b in backends
+        }
+        return stats
@@ -0,0 +1,380 @@
+"""识别链路的端到端延迟基准测试
+
+对 截图 → 编码 → base64 → 请求 各阶段计时，请求发往本地模拟接口
+(mock_server.py)，按分辨率和编码配置分别统计 p50/p95/p99、吞吐量和内存，
+结果保存为JSON以便对比回归。
+
+用法:
+    python benchmark.py
+    python benchmark.py --iterations 50 --resolutions 1280x720,1920x1080 --stream
+    python benchmark.py --capture screen --latency 0.5 --error-rate 0.05
+    python benchmark.py --frame-path --resolutions 1920x1080,2560x1440
+
+--frame-path 只比较截图到编码的两种画面路径(不发请求)：
+    pil    旧路径，mss缓冲区复制为bytes后转换为PIL图像，再由PIL缩放编码
+    frame  Frame直接引用mss缓冲区，由OpenCV在BGRA数据上缩放、转换并编码
+每种路径、分辨率和编码配置在单独的子进程中运行，分别记录峰值常驻内存的增长；
+每帧分配量由tracemalloc统计，只包含Python对象和NumPy数组，
+PIL和OpenCV内部的像素缓冲区只体现在常驻内存中。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from engine import AssistantEngine
+from frame import Frame
+from image_encoder import ENCODE_PROFILES, ImageEncoder
+from api_client import APIError
+from mock_server import MockOpenAIServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+STAGES = ("capture", "encode", "base64", "request", "total")
+
+
+def synthetic_frame(width, height, seed=0):
+    """生成带渐变、色块和噪点的模拟游戏画面"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = (x * 255 // max(1, width - 1)).astype(np.uint8)
+    frame[..., 1] = (y * 255 // max(1, height - 1)).astype(np.uint8)
+    frame[..., 2] = 96
+    for _ in range(24):
+        w, h = rng.integers(width // 20, width // 4), rng.integers(height // 20, height // 4)
+        left, top = rng.integers(0, width - w), rng.integers(0, height - h)
+        frame[top:top + h, left:left + w] = rng.integers(0, 256, 3)
+    noise = rng.integers(-12, 13, frame.shape)
+    return Image.fromarray(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+
+
+def synthetic_bgra(width, height, seed=0):
+    """模拟画面的mss格式BGRA数据"""
+    rgb = np.asarray(synthetic_frame(width, height, seed))
+    return np.dstack([rgb[..., ::-1], np.full((height, width), 255, np.uint8)])
+
+
+def percentiles(values):
+    """计算毫秒级统计"""
+    if not values:
+        return None
+    data = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(data, 50)), 2),
+        "p95": round(float(np.percentile(data, 95)), 2),
+        "p99": round(float(np.percentile(data, 99)), 2),
+        "mean": round(float(data.mean()), 2),
+        "max": round(float(data.max()), 2),
+    }
+
+
+def max_rss_kb():
+    """进程峰值常驻内存(KB)"""
+    # Linux子进程的ru_maxrss会继承父进程的峰值，优先读取本进程的VmHWM
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字节为单位
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_once(engine, frame_source, stream):
+    """执行一次完整识别，返回各阶段耗时(秒)和错误"""
+    timings = {}
+    start = time.perf_counter()
+
+    frame = frame_source()
+    timings["capture"] = time.perf_counter() - start
+
+    t = time.perf_counter()
+    encoded = engine.image_encoder.encode(frame)
+    timings["encode"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    image_url = engine.image_encoder.data_url(encoded)
+    timings["base64"] = time.perf_counter() - t
+
+    request = engine.build_request(engine.settings['game_prompt'], [(None, image_url)])
+    t = time.perf_counter()
+    error = None
+    try:
+        if stream:
+            engine.api_client.stream_completion(request['url'], request['headers'], request['data'])
+        else:
+            engine.api_client.complete(request['url'], request['headers'], request['data'])
+    except APIError as e:
+        error = e.status_code
+    except Exception as e:
+        error = str(e)
+    timings["request"] = time.perf_counter() - t
+    timings["total"] = time.perf_counter() - start
+    return timings, encoded["stats"]["bytes"], error
+
+
+def run_scenario(engine, frame_source, iterations, warmup, stream):
+    """对一组(分辨率, 编码配置)重复测试"""
+    samples = {stage: [] for stage in STAGES}
+    ttft = []
+    sizes = []
+    errors = {}
+
+    for i in range(warmup + iterations):
+        timings, size, error = run_once(engine, frame_source, stream)
+        if i < warmup:
+            continue
+        for stage in STAGES:
+            samples[stage].append(timings[stage])
+        if engine.api_client.last_timing and error is None:
+            ttft.append(engine.api_client.last_timing["ttft_ms"] / 1000)
+        sizes.append(size)
+        if error is not None:
+            errors[str(error)] = errors.get(str(error), 0) + 1
+
+    # 单独跟踪一次内存分配，避免tracemalloc影响计时
+    tracemalloc.start()
+    run_once(engine, frame_source, stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall = sum(samples["total"])
+    return {
+        "stages_ms": {stage: percentiles(values) for stage, values in samples.items()},
+        "ttft_ms": percentiles(ttft),
+        "throughput_rps": round(iterations / wall, 2) if wall else None,
+        "upload_kb": round(float(np.mean(sizes)) / 1024, 1),
+        "errors": errors,
+        "peak_alloc_kb": peak // 1024,
+        "max_rss_kb": max_rss_kb(),
+    }
+
+
+class FakeScreenShot:
+    """模拟mss.ScreenShot：每次截图得到新的BGRA缓冲区，bgra属性返回其bytes副本"""
+
+    def __init__(self, raw, size):
+        self.raw = raw
+        self.size = size
+
+    @property
+    def bgra(self):
+        return bytes(self.raw)
+
+
+def frame_path_convert(mode, shot):
+    if mode == "pil":
+        return Image.frombytes("RGB", shot.size, shot.bgra, "raw", "BGRX")
+    return Frame.from_screenshot(shot)
+
+
+def save_raw_frame(width, height, path):
+    """将模拟画面保存为mss格式的BGRA原始数据"""
+    synthetic_bgra(width, height).tofile(path)
+
+
+def run_frame_path(mode, resolution, raw_path, profiles, iterations, warmup):
+    """在当前进程中测试一种画面路径，返回各编码配置的结果"""
+    width, height = resolution
+    template = bytearray(os.path.getsize(raw_path))
+    with open(raw_path, 'rb') as f:
+        f.readinto(template)
+    encoder = ImageEncoder()
+    # 先加载两种路径的编码库，导入占用的内存不计入增长
+    encoder.encode(Image.new("RGB", (64, 64)))
+    encoder.encode(Frame(np.zeros((64, 64, 4), dtype=np.uint8)))
+    baseline_rss = max_rss_kb()
+
+    results = []
+    for profile in profiles:
+        encoder.set_profile(profile)
+        times = []
+        peaks = []
+        sizes = []
+        for i in range(warmup + iterations):
+            shot = FakeScreenShot(bytearray(template), (width, height))  # 每次截图的新缓冲区(两种路径相同)
+            tracemalloc.start()
+            start = time.perf_counter()
+            encoded = encoder.encode(frame_path_convert(mode, shot))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del shot
+            if i < warmup:
+                continue
+            times.append(elapsed)
+            # 扣除编码结果本身
+            peaks.append(max(0, peak - len(encoded["data"])))
+            sizes.append(len(encoded["data"]))
+        results.append({
+            "mode": mode,
+            "resolution": f"{width}x{height}",
+            "profile": profile,
+            "frame_ms": percentiles(times),
+            "alloc_per_frame_kb": round(float(np.mean(peaks)) / 1024, 1),
+            "upload_kb": round(float(np.mean(sizes)) / 1024, 1),
+        })
+    rss = max_rss_kb()
+    for result in results:
+        result["max_rss_kb"] = rss
+        result["rss_growth_kb"] = rss - baseline_rss if rss is not None else None
+    return results
+
+
+def frame_path_benchmark(args):
+    """每种路径、分辨率和编码配置在单独的子进程中运行，分别统计峰值内存"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for width, height in parse_resolutions(args.resolutions):
+            raw_path = os.path.join(tmp, f"{width}x{height}.raw")
+            save_raw_frame(width, height, raw_path)
+            for profile in args.profiles.split(','):
+                print(f"测试 {width}x{height} / {profile} ...", file=sys.stderr)
+                for mode in ("pil", "frame"):
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--frame-path-child", mode,
+                         "--resolutions", f"{width}x{height}", "--raw", raw_path, "--profiles", profile,
+                         "--iterations", str(args.iterations), "--warmup", str(args.warmup)],
+                        check=True, capture_output=True, text=True).stdout
+                    for result in json.loads(output):
+                        results.append(result)
+                        print(f"  {mode}: p50 {result['frame_ms']['p50']}ms"
+                              f" | 每帧分配 {result['alloc_per_frame_kb']}KB"
+                              f" | 内存增长 {result['rss_growth_kb']}KB", file=sys.stderr)
+    return results
+
+
+def parse_resolutions(text):
+    return [tuple(int(v) for v in item.lower().split('x')) for item in text.split(',') if item]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="识别链路延迟基准测试")
+    parser.add_argument('--iterations', type=int, default=20, help="每组测试次数")
+    parser.add_argument('--warmup', type=int, default=2, help="预热次数（不计入统计）")
+    parser.add_argument('--resolutions', default="1280x720,1920x1080,2560x1440", help="模拟画面分辨率")
+    parser.add_argument('--profiles', default=",".join(ENCODE_PROFILES), help="编码配置")
+    parser.add_argument('--capture', choices=("synthetic", "screen"), default="synthetic",
+                        help="synthetic使用模拟画面，screen实际截取屏幕")
+    parser.add_argument('--stream', action='store_true', help="使用流式请求")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟接口延迟(秒)")
+    parser.add_argument('--token-delay', type=float, default=0.005, help="模拟流式输出间隔(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="模拟接口错误概率")
+    parser.add_argument('--frame-path', action='store_true', help="比较截图到编码的PIL路径和Frame路径")
+    parser.add_argument('--frame-path-child', choices=("pil", "frame"), help=argparse.SUPPRESS)
+    parser.add_argument('--raw', help=argparse.SUPPRESS)
+    parser.add_argument('--output', help="结果文件（默认 benchmark_results/bench-时间.json）")
+    args = parser.parse_args(argv)
+
+    if args.frame_path_child:
+        profiles = [p for p in args.profiles.split(',') if p in ENCODE_PROFILES]
+        results = run_frame_path(args.frame_path_child, parse_resolutions(args.resolutions)[0], args.raw,
+                                 profiles, args.iterations, args.warmup)
+        print(json.dumps(results, ensure_ascii=False))
+        return 0
+    if args.frame_path:
+        return save_report(args, frame_path_benchmark(args))
+
+    server = MockOpenAIServer({
+        "latency": args.latency,
+        "token_delay": args.token_delay,
+        "error_rate": args.error_rate,
+    }).start()
+
+    engine = AssistantEngine({
+        "api_key": "benchmark",
+        "base_url": server.base_url,
+        "model": "mock-model",
+        "stream": args.stream,
+        "cache": {"enabled": False, "persist": False},
+        # 测量原始延迟，不限流也不重试
+        "rate_limit": {"rpm": 0, "tpm": 0, "max_retries": 0, "breaker_failures": 10 ** 9},
+    })
+
+    if args.capture == "screen":
+        engine.capture_service.start()
+        resolutions = [None]
+    else:
+        resolutions = parse_resolutions(args.resolutions)
+
+    results = []
+    try:
+        for resolution in resolutions:
+            if resolution is None:
+                frame_source = engine.capture
+                label = "screen"
+            else:
+                frame = Frame(synthetic_bgra(*resolution))
+                # 与截图服务相同，每次截图得到一帧新的BGRA画面
+                frame_source = frame.copy
+                label = f"{resolution[0]}x{resolution[1]}"
+
+            for profile in args.profiles.split(','):
+                if profile not in engine.image_encoder.profiles:
+                    print(f"跳过未知编码配置: {profile}", file=sys.stderr)
+                    continue
+                engine.image_encoder.set_profile(profile)
+                print(f"测试 {label} / {profile} ...", file=sys.stderr)
+                # 屏蔽每次请求的耗时输出
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = run_scenario(engine, frame_source, args.iterations, args.warmup, args.stream)
+                result.update({"resolution": label, "profile": profile})
+                results.append(result)
+
+                stages = result["stages_ms"]
+                print(f"  总计 p50 {stages['total']['p50']}ms p95 {stages['total']['p95']}ms"
+                      f" | 编码 {stages['encode']['p50']}ms | 上传 {result['upload_kb']}KB"
+                      f" | {result['throughput_rps']} 次/秒", file=sys.stderr)
+    finally:
+        engine.close()
+        server.stop()
+
+    return save_report(args, results, mock_requests=server.requests)
+
+
+def save_report(args, results, **extra):
+    """保存测试结果为JSON"""
+    report = {
+        "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "options": vars(args),
+    }
+    report.update(extra)
+    report["results"] = results
+
+    output = args.output
+    if not output:
+        os.makedirs("benchmark_results", exist_ok=True)
+        output = os.path.join("benchmark_results", time.strftime("bench-%Y%m%d-%H%M%S.json"))
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存: {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+from collections import deque
+
+from frame import gray_thumbnail
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+# 默认边框裁剪设置，可在config.json的"trim"中覆盖
+DEFAULT_TRIM_SETTINGS = {
+    "enabled": True,
+    "history": 8,            # 参与检测的最近帧数，攒满后开始检测
+    "sample_width": 320,     # 检测用缩略图宽度
+    "uniform_tolerance": 6,  # 一行/列内亮度差不超过此值视为纯色(黑边)
+    "static_tolerance": 4,   # 像素在窗口内变化不超过此值视为静止
+    "static_ratio": 0.05,    # 一行/列中活动像素少于此比例视为静止(允许时钟等小部件)
+    "min_motion": 0.01,      # 画面中活动像素少于此比例时不做静止检测(画面整体静止无法区分)
+    "min_trim": 0.02,        # 裁掉部分少于此比例时不裁剪
+    "min_keep": 0.3,         # 保留区域的宽高至少为原图的此比例
+    "margin": 2,             # 向内收缩的安全边距(原图像素)
+}
+
+
+def _leading(mask):
+    """数组开头连续为True的个数"""
+    if mask.all():
+        return len(mask)
+    return int(np.argmin(mask))
+
+
+class BorderTrimmer:
+    """自动裁掉上传图像中的黑边和静止边框
+
+    在最近几帧的灰度缩略图上向量化检测四周的纯色行列(黑边)和
+    窗口内几乎不变的行列(任务栏、固定的窗口边框)，得到游戏画面区域。
+    裁剪框缓存到布局变化(尺寸改变或被裁掉的区域出现变化)为止。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_TRIM_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._history = deque(maxlen=int(self.settings["history"]))
+        self._last_frame = None
+        self.size = None       # 检测时的原图尺寸
+        self.box = None        # 裁剪框 (left, top, right, bottom)，None表示不裁剪
+        self._mask = None      # 缩略图上被裁掉的区域
+        self._reference = None # 确定裁剪框时的缩略图
+
+        # 统计
+        self.layouts = 0
+        self.frames_trimmed = 0
+        self.bytes_saved = 0
+        self.bytes_saved_per_frame = None  # 当前布局下每帧节省的字节数，尚未测量时为None
+
+    def reset(self):
+        """清除检测历史和裁剪框"""
+        self._history.clear()
+        self._last_frame = None
+        self.size = None
+        self.box = None
+        self._mask = None
+        self._reference = None
+        self.bytes_saved_per_frame = None
+
+    def _thumbnail(self, image):
+        return gray_thumbnail(image, self.settings["sample_width"])
+
+    def observe(self, image):
+        """记录一帧画面，必要时更新裁剪框"""
+        if not self.settings["enabled"] or image is None or image is self._last_frame:
+            return
+        self._last_frame = image
+
+        if image.size != self.size:
+            # 分辨率或截图区域改变
+            self.reset()
+            self._last_frame = image
+            self.size = image.size
+
+        small = self._thumbnail(image)
+        if self.box is not None and self._layout_changed(small):
+            print("画面布局变化，重新检测边框")
+            self.box = None
+            self._mask = None
+            self._reference = None
+            self.bytes_saved_per_frame = None
+            self._history.clear()
+
+        self._history.append(small)
+        if self.box is None and len(self._history) == self._history.maxlen:
+            self._detect()
+
+    def _layout_changed(self, small):
+        """被裁掉的区域是否出现了明显变化"""
+        diff = cv2.absdiff(small, self._reference)[self._mask]
+        return diff.size and (diff > self.settings["static_tolerance"]).mean() > self.settings["static_ratio"]
+
+    def _detect(self):
+        stack = np.stack(self._history)  # (帧, 高, 宽)
+        height, width = stack.shape[1:]
+
+        # 每一帧中都是纯色的行列(黑边)
+        row_border = (np.ptp(stack, axis=2) <= self.settings["uniform_tolerance"]).all(axis=0)
+        col_border = (np.ptp(stack, axis=1) <= self.settings["uniform_tolerance"]).all(axis=0)
+
+        # 窗口内几乎不变的行列，只有画面其它部分在动时才可靠
+        live = np.ptp(stack, axis=0) > self.settings["static_tolerance"]
+        if live.mean() >= self.settings["min_motion"]:
+            row_border |= live.mean(axis=1) < self.settings["static_ratio"]
+            col_border |= live.mean(axis=0) < self.settings["static_ratio"]
+
+        top = _leading(row_border)
+        if top == height:
+            return
+        bottom = height - _leading(row_border[::-1])
+        left = _leading(col_border)
+        right = width - _leading(col_border[::-1])
+
+        keep_w, keep_h = (right - left) / width, (bottom - top) / height
+        if keep_w < self.settings["min_keep"] or keep_h < self.settings["min_keep"]:
+            return
+        if keep_w * keep_h > 1.0 - self.settings["min_trim"]:
+            return
+
+        # 换算回原图坐标并向内收缩安全边距
+        full_w, full_h = self.size
+        sx, sy = full_w / float(width), full_h / float(height)
+        margin = self.settings["margin"]
+        self.box = (
+            min(full_w, int(np.ceil(left * sx)) + margin) if left else 0,
+            min(full_h, int(np.ceil(top * sy)) + margin) if top else 0,
+            max(0, int(right * sx) - margin) if right < width else full_w,
+            max(0, int(bottom * sy) - margin) if bottom < height else full_h,
+        )
+        self._mask = np.ones((height, width), dtype=bool)
+        self._mask[top:bottom, left:right] = False
+        self._reference = stack[-1].copy()
+        self.layouts += 1
+        print(f"检测到画面区域 {self.box}，原图 {full_w}x{full_h}")
+
+    def crop(self, image):
+        """按缓存的裁剪框裁剪，尺寸不符或尚无裁剪框时原样返回"""
+        if self.box is None or image.size != self.size:
+            return image
+        self.frames_trimmed += 1
+        if self.bytes_saved_per_frame:
+            self.bytes_saved += self.bytes_saved_per_frame
+        return image.crop(self.box)
+
+    @property
+    def needs_measure(self):
+        """当前布局下是否还未测量节省的字节数"""
+        return self.box is not None and self.bytes_saved_per_frame is None
+
+    def record_saving(self, full_bytes, trimmed_bytes):
+        """记录同一帧裁剪前后的编码大小"""
+        self.bytes_saved_per_frame = max(0, full_bytes - trimmed_bytes)
+        self.bytes_saved += self.bytes_saved_per_frame
+
+    def get_stats(self):
+        return {
+            "box": self.box,
+            "size": self.size,
+            "layouts": self.layouts,
+            "frames_trimmed": self.frames_trimmed,
+            "bytes_saved_per_frame": self.bytes_saved_per_frame or 0,
+            "bytes_saved": self.bytes_saved,
+        }
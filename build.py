@@ -1,6 +1,12 @@
 import os
 import subprocess
 
+# lazy_import() 延迟导入的模块，PyInstaller无法从代码中分析出来，需要显式声明
+HIDDEN_IMPORTS = [
+    "cv2", "numpy", "requests", "mss",
+    "PIL.Image", "PIL.ImageTk", "PIL.ImageDraw", "PIL.ImageFont", "PIL.features",
+]
+
 def build_executable():
     print("开始打包程序...")
     
@@ -11,8 +17,10 @@ def build_executable():
         "--windowed",
         "--name=AI游戏助手",
         "--icon=icon.ico",  # 如果有图标文件
-        "main_enhance.py"
     ]
+    for module in HIDDEN_IMPORTS:
+        cmd.append(f"--hidden-import={module}")
+    cmd.append("main_enhanced.py")
     
     try:
         subprocess.run(cmd, check=True)
@@ -0,0 +1,225 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from frame import Frame
+from lazy_import import lazy_import
+
+mss = lazy_import("mss")
+
+
+class CaptureService:
+    """后台截图服务
+
+    在独立线程中持有唯一的 mss 截图器，按设定帧率持续截图并写入
+    双缓冲的"最新画面"槽位，读取方无需等待截图即可拿到最新画面。
+    其它区域的一次性截图也交给同一个截图线程完成。
+
+    在无显示器的环境中可用 Xvfb 测试:
+        xvfb-run -s "-screen 0 1280x720x24" python capture_service.py
+    """
+
+    def __init__(self, fps=5.0, region=None):
+        self.fps = max(0.1, float(fps))
+        self.region = self._normalize(region)  # (x, y, w, h)，None表示主显示器全屏
+
+        # 双缓冲槽位: 写入方写后缓冲，完成后交换；读取方只读前缓冲
+        self._buffers = [None, None]  # [(image, timestamp, region), ...]
+        self._front = 0
+        self._cond = threading.Condition()
+
+        self._requests = queue.Queue()  # 一次性截图请求
+        self._wakeup = threading.Event()
+        self._running = False
+        self._thread = None
+        self.last_error = None
+
+        # 统计
+        self._frame_times = deque(maxlen=30)
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.frames_captured = 0
+
+    @staticmethod
+    def _normalize(region):
+        return tuple(int(v) for v in region) if region else None
+
+    def start(self):
+        """启动截图线程"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止截图线程"""
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def set_region(self, region):
+        """切换持续截图的区域"""
+        region = self._normalize(region)
+        if region == self.region:
+            return
+        with self._cond:
+            self.region = region
+            # 旧区域的画面作废
+            self._buffers = [None, None]
+        self._wakeup.set()
+
+    def set_fps(self, fps):
+        """设置截图帧率"""
+        self.fps = max(0.1, float(fps))
+        self._wakeup.set()
+
+    def get_latest(self, timeout=1.0, max_age=None):
+        """读取最新画面，没有可用画面时最多等待timeout秒"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                slot = self._buffers[self._front]
+                if slot is not None and slot[2] == self.region:
+                    if max_age is None or time.time() - slot[1] <= max_age:
+                        return slot[0]
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(remaining)
+
+    def get_next(self, previous, timeout=1.0):
+        """等待一帧不同于previous的新画面，超时返回None"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                slot = self._buffers[self._front]
+                if slot is not None and slot[2] == self.region and slot[0] is not previous:
+                    return slot[0]
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._cond.wait(remaining)
+
+    def grab(self, region=None, timeout=2.0):
+        """立即截取指定区域（在截图线程中执行）"""
+        if not self._running:
+            self.start()
+        done = threading.Event()
+        holder = {}
+        self._requests.put((self._normalize(region), holder, done))
+        self._wakeup.set()
+        if not done.wait(timeout):
+            return None
+        return holder.get('image')
+
+    def get_stats(self):
+        """获取截图延迟和实际帧率"""
+        times = list(self._frame_times)
+        if len(times) >= 2 and times[-1] > times[0]:
+            fps = (len(times) - 1) / (times[-1] - times[0])
+        else:
+            fps = 0.0
+        return {
+            'fps': fps,
+            'latency_ms': self.last_latency * 1000,
+            'avg_latency_ms': self.avg_latency * 1000,
+            'frames': self.frames_captured,
+        }
+
+    def _grab(self, sct, region):
+        """执行一次截图"""
+        if region:
+            monitor = {
+                "top": region[1],
+                "left": region[0],
+                "width": region[2],
+                "height": region[3]
+            }
+        else:
+            monitor = sct.monitors[1]  # 主显示器
+
+        start = time.perf_counter()
+        screenshot = sct.grab(monitor)
+        # 直接引用截图缓冲区，不做颜色转换和复制
+        img = Frame.from_screenshot(screenshot)
+        latency = time.perf_counter() - start
+
+        self.last_latency = latency
+        if self.avg_latency:
+            self.avg_latency = self.avg_latency * 0.9 + latency * 0.1
+        else:
+            self.avg_latency = latency
+        return img
+
+    def _publish(self, img, region):
+        """写入后缓冲并交换"""
+        with self._cond:
+            if region != self.region:
+                return
+            back = 1 - self._front
+            self._buffers[back] = (img, time.time(), region)
+            self._front = back
+            self._cond.notify_all()
+        self._frame_times.append(time.time())
+        self.frames_captured += 1
+
+    def _run(self):
+        """截图线程主循环"""
+        try:
+            with mss.mss() as sct:
+                next_grab = 0.0
+                while self._running:
+                    # 先处理一次性截图请求
+                    while True:
+                        try:
+                            region, holder, done = self._requests.get_nowait()
+                        except queue.Empty:
+                            break
+                        try:
+                            holder['image'] = self._grab(sct, region)
+                        except Exception as e:
+                            print(f"截屏失败: {e}")
+                        done.set()
+
+                    now = time.time()
+                    if now >= next_grab:
+                        region = self.region
+                        try:
+                            self._publish(self._grab(sct, region), region)
+                            self.last_error = None
+                        except Exception as e:
+                            self.last_error = e
+                            print(f"截屏失败: {e}")
+                        next_grab = now + 1.0 / self.fps
+
+                    self._wakeup.wait(max(0.0, next_grab - time.time()))
+                    self._wakeup.clear()
+        except Exception as e:
+            self.last_error = e
+            print(f"截图服务启动失败: {e}")
+        finally:
+            self._running = False
+            with self._cond:
+                self._cond.notify_all()
+            # 唤醒仍在等待的一次性请求
+            while True:
+                try:
+                    _, _, done = self._requests.get_nowait()
+                except queue.Empty:
+                    break
+                done.set()
+
+
+if __name__ == "__main__":
+    # 简单自测: 运行几秒并输出帧率和截图延迟
+    service = CaptureService(fps=10)
+    service.start()
+    time.sleep(3)
+    frame = service.get_latest()
+    print(f"最新画面: {frame.size if frame else None}")
+    print(f"统计: {service.get_stats()}")
+    service.stop()
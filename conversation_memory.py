@@ -0,0 +1,115 @@
+import re
+import threading
+from collections import deque
+
+
+# 默认对话记忆设置，可在config.json的"memory"中覆盖
+DEFAULT_MEMORY_SETTINGS = {
+    "token_budget": 1200,      # 记忆部分(摘要+画面+最近对话)的token上限
+    "recent_turns": 6,         # 原样保留的最近对话轮数
+    "summary_tokens": 300,     # 早期对话摘要的token上限
+    "analysis_tokens": 200,    # 最近一次画面分析的token上限
+    "turn_chars": 60,          # 折叠进摘要时每句保留的字数
+}
+
+CJK_PATTERN = re.compile(r'[　-鿿가-힯＀-￯]')
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中日韩字符按1个，其余按4个字符1个"""
+    if not text:
+        return 0
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_tokens(text, max_tokens, keep_end=False):
+    """按估算token数截断文本"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        part = text[-mid:] if keep_end else text[:mid]
+        if estimate_tokens(part) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return ("…" + text[-low:]) if keep_end else (text[:low] + "…")
+
+
+class ConversationMemory:
+    """按token预算滚动的对话记忆
+
+    最近几轮对话原样保留，更早的对话折叠为简短摘要，
+    并附上最近一次画面分析，使提示词长度不随会话时长增长。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_MEMORY_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._lock = threading.Lock()
+        self.turns = deque()  # [(用户, AI), ...]
+        self.summary = []     # 折叠后的早期对话
+        self.last_analysis = ""
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary = []
+            self.last_analysis = ""
+
+    def add_turn(self, user, assistant):
+        """记录一轮对话"""
+        with self._lock:
+            self.turns.append((user, assistant))
+            while len(self.turns) > self.settings["recent_turns"]:
+                self._fold(*self.turns.popleft())
+
+    def set_analysis(self, text):
+        """记录最近一次画面分析"""
+        with self._lock:
+            self.last_analysis = truncate_tokens(text.strip(), self.settings["analysis_tokens"])
+
+    def _fold(self, user, assistant):
+        """将一轮对话压缩进摘要，超出上限时丢弃最早的部分"""
+        chars = self.settings["turn_chars"]
+        self.summary.append(f"用户问“{user[:chars]}”，你答“{assistant[:chars]}”")
+        while len(self.summary) > 1 and estimate_tokens("；".join(self.summary)) > self.settings["summary_tokens"]:
+            self.summary.pop(0)
+
+    def build_context(self):
+        """生成不超过token预算的记忆文本"""
+        with self._lock:
+            budget = self.settings["token_budget"]
+            sections = []
+
+            if self.summary:
+                summary = truncate_tokens("；".join(self.summary), self.settings["summary_tokens"], keep_end=True)
+                sections.append(f"之前的对话摘要: {summary}")
+            if self.last_analysis:
+                sections.append(f"最近一次画面分析: {self.last_analysis}")
+            used = sum(estimate_tokens(s) for s in sections)
+
+            # 从最新的一轮开始放入，超出预算的更早轮次被省略
+            recent = []
+            for user, assistant in reversed(self.turns):
+                turn = f"用户: {user}\nAI: {assistant}"
+                cost = estimate_tokens(turn)
+                if used + cost > budget:
+                    break
+                recent.insert(0, turn)
+                used += cost
+            if recent:
+                sections.append("最近的对话:\n" + "\n".join(recent))
+
+            return "\n\n".join(sections)
+
+    def build_prompt(self, personality, message):
+        """构建带记忆的对话提示词"""
+        context = self.build_context()
+        memory = f"{context}\n\n" if context else ""
+        return (f"{personality}\n\n{memory}用户说: {message}\n\n"
+                "请回复用户。如果用户询问游戏相关问题，可以要求截图分析。")
@@ -0,0 +1,175 @@
+from frame import gray_thumbnail
+from image_encoder import ImageEncoder
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+# 默认局部上传设置，可在config.json的"delta"中覆盖
+DEFAULT_DELTA_SETTINGS = {
+    "sample_width": 320,      # 比较用缩略图宽度
+    "pixel_threshold": 16,    # 灰度差超过此值的像素视为变化
+    "max_area": 0.25,         # 变化区域合计超过画面的此比例时发送整帧
+    "max_regions": 3,         # 最多分别上传的变化区域数，超过时合并为一个外接矩形
+    "padding": 24,            # 变化区域向外扩展的像素(原图)
+    "min_size": 96,           # 裁剪区域的最小边长(原图像素)
+    "thumbnail_edge": 384,    # 整体缩略图的最长边
+    "full_every": 10,         # 每隔多少次请求强制发送一次整帧(0表示不强制)
+}
+
+
+class DeltaCropper:
+    """只上传画面中变化的区域
+
+    与上一次成功分析的画面比较灰度缩略图，求出各处变化像素的外接矩形，
+    以原分辨率上传这些区域，另附一张低分辨率的整体缩略图作为上下文。
+    变化区域过大、尺寸改变或到了强制刷新的间隔时发送整帧。
+    """
+
+    def __init__(self, settings=None, enabled=False):
+        self.settings = dict(DEFAULT_DELTA_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.enabled = bool(enabled)
+
+        self.reference = None  # 上一次分析画面的缩略图
+        self.size = None
+        self._since_full = 0
+
+        # 统计
+        self.full_frames = 0
+        self.delta_frames = 0
+        self.upload_bytes = 0
+        self.last_boxes = []
+
+    def set_enabled(self, enabled):
+        self.enabled = bool(enabled)
+        self.reset()
+
+    def reset(self):
+        """下一次发送整帧"""
+        self.reference = None
+        self.size = None
+
+    def _thumbnail(self, image):
+        return gray_thumbnail(image, self.settings["sample_width"])
+
+    def changed_boxes(self, small, full_size):
+        """各处变化像素的外接矩形(原图坐标)，没有变化时返回空列表"""
+        changed = (cv2.absdiff(small, self.reference) > self.settings["pixel_threshold"]).astype(np.uint8)
+        # 膨胀后按连通域分组，相邻的变化归为同一个区域
+        changed = cv2.dilate(changed, np.ones((3, 3), np.uint8), iterations=2)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+        boxes = [(x, y, x + w, y + h) for x, y, w, h in stats[1:count, :4]]
+        if not boxes:
+            return []
+        if len(boxes) > self.settings["max_regions"]:
+            boxes = [self._union(boxes)]
+
+        full_w, full_h = full_size
+        sx, sy = full_w / float(small.shape[1]), full_h / float(small.shape[0])
+        pad = self.settings["padding"]
+        min_size = self.settings["min_size"]
+        result = []
+        for left, top, right, bottom in boxes:
+            left = max(0, int(left * sx) - pad)
+            top = max(0, int(top * sy) - pad)
+            right = min(full_w, int(np.ceil(right * sx)) + pad)
+            bottom = min(full_h, int(np.ceil(bottom * sy)) + pad)
+            # 太小的区域向四周扩展，保留一些周围的内容
+            left, right = self._expand(left, right, min_size, full_w)
+            top, bottom = self._expand(top, bottom, min_size, full_h)
+            result.append((left, top, right, bottom))
+        return self._merge_overlapping(result)
+
+    @staticmethod
+    def _union(boxes):
+        return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+    @classmethod
+    def _merge_overlapping(cls, boxes):
+        """合并扩展后相互重叠的区域"""
+        boxes = list(boxes)
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    a, b = boxes[i], boxes[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        boxes[i] = cls._union([a, b])
+                        del boxes[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return boxes
+
+    @staticmethod
+    def _expand(start, end, size, limit):
+        if end - start >= size:
+            return start, end
+        center = (start + end) // 2
+        start = max(0, min(center - size // 2, limit - size))
+        return start, min(limit, start + size)
+
+    def plan(self, image):
+        """决定本次上传的内容，返回 (变化区域列表, 待提交的状态)，空列表表示发送整帧
+
+        不改变比较基准，请求成功后再以返回的状态调用commit()。
+        """
+        if not self.enabled:
+            return [], {"small": None, "size": None, "boxes": []}
+
+        small = self._thumbnail(image)
+        boxes = []
+        full_every = self.settings["full_every"]
+        if (self.reference is not None and image.size == self.size
+                and not (full_every and self._since_full + 1 >= full_every)):
+            boxes = self.changed_boxes(small, image.size)
+            area = sum((b[2] - b[0]) * (b[3] - b[1]) for b in boxes)
+            if area > self.settings["max_area"] * image.width * image.height:
+                boxes = []
+        return boxes, {"small": small, "size": image.size, "boxes": boxes}
+
+    def commit(self, pending, upload_bytes):
+        """请求成功后调用：以该帧作为新的比较基准并计入统计
+
+        丢弃、失败或被熔断拒绝的请求不提交，下一帧仍与模型上次看到的画面比较。
+        """
+        boxes = pending["boxes"]
+        if pending["small"] is not None:
+            self.reference = pending["small"]
+            self.size = pending["size"]
+        self.last_boxes = boxes
+        if boxes:
+            self._since_full += 1
+            self.delta_frames += 1
+        else:
+            self._since_full = 0
+            self.full_frames += 1
+        self.upload_bytes += upload_bytes
+
+    def build_images(self, image, boxes):
+        """生成局部上传的图像 [(说明文字, 图像), ...]"""
+        size = ImageEncoder.fit_size(image.width, image.height, self.settings["thumbnail_edge"])
+        thumbnail = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        images = [(f"整个画面的低分辨率缩略图（原图 {image.width}x{image.height}，仅供了解全局）", thumbnail)]
+        for i, (left, top, right, bottom) in enumerate(boxes, 1):
+            images.append((f"画面中新变化的区域{i}（原图坐标 x={left}, y={top}, 宽{right - left}, 高{bottom - top}），"
+                           "请重点分析这一部分", image.crop((left, top, right, bottom))))
+        return images
+
+    def get_stats(self):
+        requests_total = self.full_frames + self.delta_frames
+        return {
+            "enabled": self.enabled,
+            "full_frames": self.full_frames,
+            "delta_frames": self.delta_frames,
+            "delta_rate": self.delta_frames / requests_total if requests_total else 0.0,
+            "avg_upload_kb": self.upload_bytes / requests_total / 1024 if requests_total else 0.0,
+            "last_boxes": self.last_boxes,
+        }
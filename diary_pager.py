@@ -0,0 +1,83 @@
+import os
+
+
+class DiaryPager:
+    """按页从文件末尾向前读取日记
+
+    打开时只读取标题行和最后一页，向上滚动时再读取更早的一页，
+    只记录已加载部分的起止字节偏移，打开耗时与文件大小无关。
+    """
+
+    def __init__(self, path, page_lines=300, block_size=64 * 1024):
+        self.path = path
+        self.page_lines = page_lines
+        self.block_size = block_size
+
+        with open(path, 'rb') as f:
+            first = f.readline()
+        self.title = first.decode('utf-8', errors='replace').rstrip('\r\n')
+        self.body_offset = len(first)  # 正文(标题行之后)的起始偏移
+
+        self.end = os.path.getsize(path)
+        self.start = self.end          # 已加载部分的起始偏移
+
+    @property
+    def at_start(self):
+        """是否已加载到正文开头"""
+        return self.start <= self.body_offset
+
+    def _find_page_start(self, f, offset):
+        """从offset向前查找page_lines行，返回该页的起始偏移"""
+        newlines = 0
+        pos = offset
+        while pos > self.body_offset:
+            size = min(self.block_size, pos - self.body_offset)
+            pos -= size
+            f.seek(pos)
+            block = f.read(size)
+            # offset前紧邻的换行属于上一行的结尾，不计入
+            end = len(block) - 1 if pos + size == offset else len(block)
+            index = end
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index < 0:
+                    break
+                newlines += 1
+                if newlines >= self.page_lines:
+                    return pos + index + 1
+        return self.body_offset
+
+    def _read(self, f, start, end):
+        f.seek(start)
+        return f.read(end - start).decode('utf-8', errors='replace')
+
+    def read_tail(self):
+        """读取最后一页"""
+        return self.read_previous()
+
+    def read_previous(self):
+        """读取已加载部分之前的一页，已到开头时返回空字符串"""
+        if self.at_start:
+            return ""
+        with open(self.path, 'rb') as f:
+            start = self._find_page_start(f, self.start)
+            text = self._read(f, start, self.start)
+        self.start = start
+        return text
+
+    def read_new(self):
+        """读取打开后追加到文件末尾的内容"""
+        size = os.path.getsize(self.path)
+        if size <= self.end:
+            return ""
+        with open(self.path, 'rb') as f:
+            text = self._read(f, self.end, size)
+        self.end = size
+        return text
+
+    def read_unloaded(self):
+        """读取尚未加载的正文（保存整篇日记时使用）"""
+        if self.at_start:
+            return ""
+        with open(self.path, 'rb') as f:
+            return self._read(f, self.body_offset, self.start)
@@ -0,0 +1,192 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+# 自动日记中每条记录以 [YYYY-MM-DD HH:MM:SS] 开头
+ENTRY_PATTERN = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] ?', re.MULTILINE)
+
+INDEX_FILE = "diary_index.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    title TEXT,
+    mtime REAL,
+    size INTEGER
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    ts TEXT,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_name ON entries(name);
+"""
+
+
+def parse_diary(text, default_title):
+    """拆分日记为 (标题, [(时间, 内容), ...])"""
+    title = default_title
+    if text.startswith("标题: "):
+        first, _, text = text.partition("\n")
+        title = first[len("标题: "):].strip() or default_title
+
+    entries = []
+    matches = list(ENTRY_PATTERN.finditer(text))
+    head = text[:matches[0].start()] if matches else text
+    if head.strip():
+        entries.append((None, head.strip()))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if body:
+            entries.append((match.group(1), body))
+    return title, entries
+
+
+class DiaryStore:
+    """日记索引（SQLite WAL + FTS5全文检索）
+
+    日记仍以 .txt 文件保存，sync() 按修改时间和大小增量导入有变化的文件，
+    search() 返回按相关度排序的片段。
+    """
+
+    def __init__(self, folder, db_path=None):
+        self.folder = folder
+        self.db_path = db_path or os.path.join(folder, INDEX_FILE)
+        self._lock = threading.Lock()
+        self.last_search_ms = 0.0
+
+        os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.tokenizer = self._create_fts()
+        self.conn.commit()
+
+    def _create_fts(self):
+        """创建全文索引，优先使用支持中文子串匹配的trigram分词"""
+        for tokenizer in ("trigram", "unicode61"):
+            try:
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+                    f"body, content='entries', content_rowid='id', tokenize='{tokenizer}')"
+                )
+                row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name='entries_fts'").fetchone()
+                return "trigram" if "trigram" in row[0] else "unicode61"
+            except sqlite3.OperationalError:
+                continue
+        print("SQLite不支持FTS5，日记搜索将使用逐条匹配")
+        return None
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def sync(self):
+        """增量导入有变化的日记文件，返回导入的文件数"""
+        files = {}
+        try:
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and entry.name.endswith('.txt'):
+                    stat = entry.stat()
+                    files[entry.name[:-4]] = (stat.st_mtime, stat.st_size)
+        except OSError as e:
+            print(f"扫描日记失败: {e}")
+            return 0
+
+        with self._lock:
+            known = {name: (mtime, size) for name, mtime, size in
+                     self.conn.execute("SELECT name, mtime, size FROM files")}
+
+            changed = [name for name, stat in files.items() if known.get(name) != stat]
+            removed = [name for name in known if name not in files]
+            if not changed and not removed:
+                return 0
+
+            with self.conn:
+                for name in removed:
+                    self._delete(name)
+                for name in changed:
+                    self._import(name, *files[name])
+        return len(changed)
+
+    def _delete(self, name):
+        if self.tokenizer:
+            self.conn.execute(
+                "INSERT INTO entries_fts(entries_fts, rowid, body) "
+                "SELECT 'delete', id, body FROM entries WHERE name = ?", (name,))
+        self.conn.execute("DELETE FROM entries WHERE name = ?", (name,))
+        self.conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+    def _import(self, name, mtime, size):
+        try:
+            with open(os.path.join(self.folder, f"{name}.txt"), 'r', encoding='utf-8') as f:
+                text = f.read()
+        except Exception as e:
+            print(f"导入日记失败 {name}: {e}")
+            return
+
+        title, entries = parse_diary(text, name)
+        self._delete(name)
+        self.conn.execute("INSERT INTO files(name, title, mtime, size) VALUES (?, ?, ?, ?)",
+                          (name, title, mtime, size))
+        for ts, body in entries:
+            cursor = self.conn.execute("INSERT INTO entries(name, ts, body) VALUES (?, ?, ?)", (name, ts, body))
+            if self.tokenizer:
+                self.conn.execute("INSERT INTO entries_fts(rowid, body) VALUES (?, ?)", (cursor.lastrowid, body))
+
+    def list_diaries(self):
+        """按修改时间从新到旧列出日记名"""
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT name FROM files ORDER BY mtime DESC")]
+
+    def _match_query(self, terms):
+        """构造FTS5查询，每个词按短语匹配"""
+        return " ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+    def search(self, query, limit=50):
+        """全文搜索，返回 [{'name', 'ts', 'snippet'}, ...]"""
+        terms = query.split()
+        if not terms:
+            return []
+
+        # trigram至少需要3个字符，更短的词改用逐条匹配
+        if self.tokenizer == "trigram":
+            indexed = [t for t in terms if len(t) >= 3]
+        else:
+            indexed = terms if self.tokenizer else []
+        others = [t for t in terms if t not in indexed]
+        like = " AND ".join("e.body LIKE ?" for _ in others)
+        like_args = [f"%{t}%" for t in others]
+
+        start = time.perf_counter()
+        with self._lock:
+            if indexed:
+                rows = self.conn.execute(
+                    "SELECT e.name, e.ts, snippet(entries_fts, 0, '【', '】', '…', 16) "
+                    "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                    f"WHERE entries_fts MATCH ? {'AND ' + like if like else ''} "
+                    "ORDER BY bm25(entries_fts) LIMIT ?",
+                    [self._match_query(indexed)] + like_args + [limit]).fetchall()
+            else:
+                rows = self.conn.execute(
+                    f"SELECT e.name, e.ts, e.body FROM entries e WHERE {like} ORDER BY e.ts DESC LIMIT ?",
+                    like_args + [limit]).fetchall()
+                rows = [(name, ts, self._snippet(body, terms[0])) for name, ts, body in rows]
+
+        self.last_search_ms = (time.perf_counter() - start) * 1000
+        return [{"name": name, "ts": ts, "snippet": snippet.replace("\n", " ")} for name, ts, snippet in rows]
+
+    @staticmethod
+    def _snippet(body, term, width=30):
+        pos = body.find(term)
+        if pos < 0:
+            return body[:width * 2]
+        left = max(0, pos - width)
+        text = body[left:pos] + f"【{term}】" + body[pos + len(term):pos + len(term) + width]
+        return ("…" if left else "") + text
@@ -0,0 +1,144 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+
+# 默认日记写入设置，可在config.json的"diary"中覆盖
+DEFAULT_DIARY_SETTINGS = {
+    "flush_interval": 1.0,   # 最长缓冲时间(秒)
+    "flush_bytes": 8192,     # 缓冲达到该字节数时立即写入
+    "fsync": False,          # 写入后是否同步到磁盘
+}
+
+
+def diary_filename(day):
+    """某天的自动日记文件名"""
+    return f"游戏日记_{day}.txt"
+
+
+class DiaryWriter:
+    """后台日记写入线程
+
+    write() 只把条目放入队列，由单独的线程保持当天文件打开、批量写入，
+    按时间或大小刷新，跨过零点时自动切换到新一天的文件。
+    """
+
+    def __init__(self, folder, settings=None):
+        self.folder = folder
+        self.settings = dict(DEFAULT_DIARY_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._file = None
+        self._day = None
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        self.written = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def write(self, content, when=None):
+        """追加一条日记（不阻塞调用线程）"""
+        self._queue.put((when or datetime.now(), content))
+
+    def flush(self, timeout=2.0):
+        """等待已提交的条目写入文件"""
+        if not self._thread or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """写完队列中的所有条目后停止"""
+        if not self._thread:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self._pending_since is not None:
+                timeout = max(0.0, self._pending_since + self.settings["flush_interval"] - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._flush()
+                continue
+
+            if item is None:
+                self._flush()
+                self._close_file()
+                return
+            if isinstance(item, threading.Event):
+                self._flush()
+                item.set()
+                continue
+
+            when, content = item
+            day = when.strftime("%Y-%m-%d")
+            if day != self._day:
+                # 跨天时先写完前一天的条目
+                self._flush()
+                self._open(day)
+
+            entry = f"\n[{when.strftime('%Y-%m-%d %H:%M:%S')}] {content}\n"
+            self._pending.append(entry)
+            self._pending_bytes += len(entry.encode('utf-8'))
+            if self._pending_since is None:
+                self._pending_since = time.monotonic()
+            if self._pending_bytes >= self.settings["flush_bytes"]:
+                self._flush()
+
+    def _open(self, day):
+        self._close_file()
+        filepath = os.path.join(self.folder, diary_filename(day))
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            is_new = not os.path.exists(filepath)
+            self._file = open(filepath, 'a', encoding='utf-8')
+            if is_new:
+                self._file.write(f"标题: 游戏日记_{day}\n日期: {day}\n\n")
+            self._day = day
+        except Exception as e:
+            self._file = None
+            self._day = None
+            print(f"打开日记文件失败: {e}")
+
+    def _flush(self):
+        if not self._pending:
+            return
+        entries, count = "".join(self._pending), len(self._pending)
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        if self._file is None:
+            print(f"自动保存日记失败: 文件未打开，丢弃{count}条")
+            return
+        try:
+            self._file.write(entries)
+            self._file.flush()
+            if self.settings["fsync"]:
+                os.fsync(self._file.fileno())
+            self.written += count
+        except Exception as e:
+            print(f"自动保存日记失败: {e}")
+
+    def _close_file(self):
+        if self._file:
+            try:
+                self._file.close()
+            except Exception as e:
+                print(f"关闭日记文件失败: {e}")
+            self._file = None
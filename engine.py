@@ -0,0 +1,753 @@
+"""AI游戏助手核心引擎
+
+不依赖任何界面，负责截图、编码、调用模型API和持续监控。
+Tk界面和命令行都是它的客户端。
+
+命令行用法:
+    python -m engine monitor --region 0,0,1280,720 --interval 5
+    python -m engine monitor --triggers 艾尔登法环
+    python -m engine analyze --region 0,0,1280,720
+    python -m engine capture --output screen.png
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import time
+from urllib.parse import urlparse
+
+from scene_detector import SceneChangeDetector
+from capture_service import CaptureService
+from image_encoder import ImageEncoder, DEFAULT_PROFILE
+from api_client import get_api_client, APIError, CircuitOpenError
+from response_cache import ResponseCache, perceptual_hash
+from monitor_pipeline import MonitorPipeline
+from multi_region import bounding_box, crop_regions, build_mosaic
+from adaptive_scheduler import AdaptiveScheduler
+from metrics import get_metrics
+from backend_pool import BackendPool
+from border_trimmer import BorderTrimmer
+from delta_crop import DeltaCropper
+from trigger_engine import TriggerEngine
+
+
+# 默认引擎设置，键名与增强版的config.json一致
+DEFAULT_ENGINE_SETTINGS = {
+    "api_key": "",
+    "base_url": "https://api.openai.com/v1",
+    "model": "gpt-4o",
+    "game_prompt": "你是一个专业的游戏助手。请分析这个游戏画面，给出具体的操作建议。",
+    "max_tokens": 500,
+    "stream": True,
+    "region_mode": "fullscreen",  # fullscreen / region / multi
+    "selected_region": None,      # (x, y, w, h)
+    "named_regions": [],          # [{'name': ..., 'region': [x, y, w, h]}]
+    "multi_region_layout": "mosaic",  # mosaic / parts
+    "capture_fps": 5.0,
+    "encode_profile": DEFAULT_PROFILE,
+    "encode_profiles": {},
+    "change_threshold": 8.0,
+    "ignore_masks": [],
+    "http": None,
+    "cache": None,
+    "pipeline": None,
+    "scheduler": None,
+    "metrics": None,
+    "rate_limit": None,
+    "backends": [],  # 备用服务 [{'name', 'base_url', 'api_key', 'model'}]，按顺序故障转移
+    "failover": None,
+    "trim": None,
+    "delta_upload": False,  # 只上传变化区域和整体缩略图
+    "delta": None,
+    "trigger_mode": False,      # 只在模板触发时分析，不再按间隔轮询
+    "trigger_profile": "",      # 当前游戏的触发器配置名
+    "trigger_profiles": {},     # {配置名: [{'name', 'template', 'roi', 'threshold', 'cooldown', 'prompt'}]}
+    "trigger_scan": None,
+}
+
+
+def make_result(text, source, error=False, cached=False, elapsed=0.0):
+    """构造分析结果"""
+    return {
+        "time": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "source": source,
+        "text": text,
+        "error": error,
+        "cached": cached,
+        "elapsed_ms": round(elapsed * 1000, 1),
+    }
+
+
+class AssistantEngine:
+    """AI游戏助手核心引擎"""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_ENGINE_SETTINGS)
+        if settings:
+            self.settings.update({k: v for k, v in settings.items() if v is not None})
+
+        # 各阶段耗时统计，需在API客户端之前创建
+        self.metrics = get_metrics(self.settings['metrics'])
+
+        # 画面变化检测（跳过未变化的画面）
+        self.scene_detector = SceneChangeDetector(
+            threshold=self.settings['change_threshold'],
+            ignore_masks=self.settings['ignore_masks']
+        )
+        # 只用于衡量相邻两次检查间的画面变化
+        self.activity_detector = SceneChangeDetector(threshold=0)
+
+        # 常驻截图服务（持续刷新最新画面）
+        self.capture_service = CaptureService(fps=self.settings['capture_fps'])
+        self._preview_fps = 0.0  # 实时预览期间需要的截图帧率
+
+        # 裁掉上传图像中的黑边和静止边框
+        self.border_trimmer = BorderTrimmer(self.settings['trim'])
+
+        # 局部上传：与上一次分析的画面比较，只发送变化的区域
+        self.delta_cropper = DeltaCropper(self.settings['delta'], enabled=self.settings['delta_upload'])
+
+        # 本地模板匹配，触发模式下只在特定画面出现时分析
+        self.trigger_engine = TriggerEngine(self.settings['trigger_scan'])
+        self.load_triggers()
+        self._last_scanned = None
+
+        # 上传图像编码器
+        self.image_encoder = ImageEncoder(self.settings['encode_profile'], self.settings['encode_profiles'])
+
+        # 共享的API连接池
+        self.api_client = get_api_client(self.settings['http'], self.settings['rate_limit'])
+
+        # 主服务和备用服务，支持故障转移和对冲请求
+        self.backend_pool = BackendPool(
+            self.backend_list(),
+            self.settings['failover'],
+            is_available=lambda backend: self.api_client.is_available(backend.base_url)
+        )
+
+        # 相似画面的回复缓存
+        self.response_cache = ResponseCache(self.settings['cache'])
+
+        # 根据画面变化和API延迟自适应调整监控间隔
+        self.scheduler = AdaptiveScheduler(self.settings['scheduler'])
+
+        # 监控流水线: 截图 → 编码 → 请求
+        self.pipeline = MonitorPipeline(
+            capture=self._capture_stage,
+            encode=self._encode_stage,
+            request=self._request_stage,
+            on_error=self._on_pipeline_error,
+            settings=self.settings['pipeline'],
+            scheduler=self.scheduler
+        )
+        # 触发模式下逐帧扫描，节奏由截图帧率决定
+        self.pipeline.paced_by_capture = bool(self.settings['trigger_mode'])
+
+        # 监控回调
+        self.on_result = None   # on_result(result)
+        self.on_frame = None    # on_frame(changed) 每截取一帧调用
+        self.on_error = None    # on_error(error)
+        self.stream_factory = None  # 返回带 write(token)/finish(text) 的对象，用于流式显示
+
+        self.sync_capture_region()
+
+    # ===================
+    # 生命周期
+    # ===================
+    def start(self):
+        """启动截图服务并预热连接"""
+        self.capture_service.start()
+        self.metrics.serve()
+        if self.settings['api_key']:
+            self.api_client.warm_up(f"{self.settings['base_url']}/models", headers=self.auth_headers())
+
+    def close(self):
+        """停止监控和截图服务，保存缓存"""
+        self.stop_monitor()
+        self.capture_service.stop()
+        self.api_client.close()
+        self.response_cache.save()
+        self.metrics.close()
+
+    def update_settings(self, **settings):
+        """更新设置"""
+        self.settings.update(settings)
+        if 'encode_profile' in settings:
+            self.image_encoder.set_profile(settings['encode_profile'])
+        if 'change_threshold' in settings:
+            self.scene_detector.set_threshold(settings['change_threshold'])
+        if 'ignore_masks' in settings:
+            self.scene_detector.set_ignore_masks(settings['ignore_masks'])
+        if 'capture_fps' in settings:
+            self._apply_capture_fps()
+        if 'delta_upload' in settings:
+            self.delta_cropper.set_enabled(settings['delta_upload'])
+        if {'trigger_profile', 'trigger_profiles'} & set(settings):
+            self.load_triggers()
+        if 'trigger_mode' in settings:
+            self.pipeline.paced_by_capture = bool(settings['trigger_mode'])
+        if {'region_mode', 'selected_region', 'named_regions'} & set(settings):
+            self.sync_capture_region()
+        if {'api_key', 'base_url', 'model', 'backends'} & set(settings):
+            self.backend_pool.configure(self.backend_list())
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.settings['api_key']}"}
+
+    def backend_list(self):
+        """主服务在前、备用服务在后的服务列表"""
+        primary = {
+            'name': urlparse(self.settings['base_url']).netloc or "primary",
+            'base_url': self.settings['base_url'],
+            'api_key': self.settings['api_key'],
+            'model': self.settings['model'],
+        }
+        backends = [primary]
+        names = {primary['name']}
+        for item in self.settings['backends'] or []:
+            backend = dict(item)
+            backend.setdefault('model', self.settings['model'])
+            name = backend.get('name') or urlparse(backend['base_url']).netloc
+            while name in names:
+                name += "'"
+            backend['name'] = name
+            names.add(name)
+            backends.append(backend)
+        return backends
+
+    # ===================
+    # 截图
+    # ===================
+    def load_triggers(self):
+        """加载当前游戏配置的触发器"""
+        definitions = self.settings['trigger_profiles'].get(self.settings['trigger_profile'], [])
+        triggers = self.trigger_engine.load(definitions)
+        if definitions:
+            print(f"已加载触发器 {len(triggers)}/{len(definitions)} 个 ({self.settings['trigger_profile']})")
+
+    def has_capture_region(self):
+        """当前模式下是否已有可截取的区域"""
+        mode = self.settings['region_mode']
+        if mode == 'multi':
+            return bool(self.settings['named_regions'])
+        if mode == 'region':
+            return bool(self.settings['selected_region'])
+        return True
+
+    def get_capture_bounds(self):
+        """截图服务需要截取的区域，None表示全屏"""
+        mode = self.settings['region_mode']
+        if mode == 'multi':
+            # 多个区域一次截取外接矩形后再裁剪
+            return bounding_box([item['region'] for item in self.settings['named_regions']])
+        if mode == 'region':
+            return self.settings['selected_region']
+        return None
+
+    def sync_capture_region(self):
+        """同步截图服务的截图区域"""
+        if self.has_capture_region():
+            self.capture_service.set_region(self.get_capture_bounds())
+        self.border_trimmer.reset()
+        self.delta_cropper.reset()
+
+    def _apply_capture_fps(self):
+        self.capture_service.set_fps(max(self.settings['capture_fps'], self._preview_fps))
+
+    def set_preview_fps(self, fps=0.0):
+        """实时预览期间提高截图帧率，传入0恢复设置的帧率"""
+        self._preview_fps = float(fps or 0.0)
+        self._apply_capture_fps()
+
+    def capture(self, region=None):
+        """立即截取指定区域"""
+        with self.metrics.span("capture"):
+            return self.capture_service.grab(region)
+
+    def latest_frame(self, timeout=2.0):
+        """读取截图服务中的最新画面"""
+        with self.metrics.span("capture"):
+            frame = self.capture_service.get_latest(timeout=timeout)
+        if frame is None and self.capture_service.last_error:
+            print(f"截屏失败: {self.capture_service.last_error}")
+        with self.metrics.span("trim"):
+            self.border_trimmer.observe(frame)
+        return frame
+
+    def compose_regions(self, frame):
+        """将多区域截图裁剪为 [(名称, 图像), ...]"""
+        origin = self.get_capture_bounds()[:2]
+        return crop_regions(frame, self.settings['named_regions'], origin)
+
+    def preview_image(self, frame):
+        """用于预览的画面（多区域模式下为拼接图）"""
+        if self.settings['region_mode'] == 'multi':
+            return build_mosaic(self.compose_regions(frame))
+        return frame
+
+    def sample_activity(self):
+        """衡量画面活跃程度并交给调度器，返回变化值"""
+        frame = self.capture_service.get_latest(timeout=0.5)
+        if frame is None:
+            return None
+        self.border_trimmer.observe(frame)
+        self.activity_detector.check(frame)
+        self.scheduler.record_change(self.activity_detector.last_score)
+        return self.activity_detector.last_score
+
+    # ===================
+    # 分析
+    # ===================
+    def build_upload_images(self, image):
+        """生成要上传的图像 [(说明文字, 图像), ...]"""
+        if self.settings['region_mode'] != 'multi':
+            return [(None, image)]
+
+        tiles = self.compose_regions(image)
+        if self.settings['multi_region_layout'] == 'parts':
+            # 每个区域作为单独的图片发送
+            return [(f"区域: {name}", tile) for name, tile in tiles]
+
+        # 拼接为一张带标签的图片
+        names = "、".join(name for name, _ in tiles)
+        return [(f"图片由以下区域拼接而成，每块左上角标有名称: {names}", build_mosaic(tiles))]
+
+    def build_request(self, prompt, images=()):
+        """构造chat/completions请求"""
+        content = [
+            {
+                "type": "text",
+                "text": prompt
+            }
+        ]
+        for label, image_url in images:
+            if label:
+                content.append({"type": "text", "text": label})
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": image_url
+                }
+            })
+
+        headers = {"Content-Type": "application/json"}
+        headers.update(self.auth_headers())
+
+        data = {
+            "model": self.settings['model'],
+            "messages": [
+                {
+                    "role": "user",
+                    "content": content
+                }
+            ],
+            "max_tokens": self.settings['max_tokens']
+        }
+
+        return {
+            'url': f"{self.settings['base_url']}/chat/completions",
+            'headers': headers,
+            'data': data,
+        }
+
+    def prepare(self, image, prompt=None):
+        """准备分析请求（查缓存、编码图像），命中缓存时直接带回回复"""
+        prompt = prompt or self.settings['game_prompt']
+        model = self.settings['model']
+
+        # 裁掉黑边和静止边框（多区域模式下区域已由用户指定）
+        upload = image
+        if self.settings['region_mode'] != 'multi':
+            upload = self.border_trimmer.crop(image)
+
+        # 相似画面直接返回缓存的回复
+        with self.metrics.span("cache_lookup"):
+            image_hash = perceptual_hash(upload)
+            cached = self.response_cache.get(model, prompt, image_hash)
+        if cached is not None:
+            print("命中回复缓存")
+            self.metrics.inc("cache_hits")
+            return {'cached': cached}
+        self.metrics.inc("cache_misses")
+
+        # 局部上传：只有部分画面变化时发送变化区域和整体缩略图
+        boxes, delta = [], None
+        if self.settings['region_mode'] != 'multi':
+            boxes, delta = self.delta_cropper.plan(upload)
+        if boxes:
+            parts = self.delta_cropper.build_images(upload, boxes)
+        else:
+            parts = self.build_upload_images(upload)
+
+        # 新布局下的第一个整帧同时编码原图，测量裁剪节省的字节数
+        full_bytes = None
+        if upload is not image and not boxes and self.border_trimmer.needs_measure:
+            full_bytes = self.image_encoder.encode(image)['stats']['bytes']
+
+        # 按编码配置缩放、编码并转换为base64
+        images = []
+        upload_bytes = 0
+        for label, part in parts:
+            with self.metrics.span("encode"):
+                encoded = self.image_encoder.encode(part)
+            with self.metrics.span("base64"):
+                images.append((label, self.image_encoder.data_url(encoded)))
+            upload_bytes += encoded['stats']['bytes']
+            print(f"图像编码: {self.image_encoder.format_stats()}")
+        self.metrics.inc("upload_bytes", upload_bytes)
+        if boxes:
+            print(f"局部上传: 变化区域 {boxes}，共 {upload_bytes / 1024:.1f}KB")
+
+        if full_bytes is not None:
+            self.border_trimmer.record_saving(full_bytes, encoded['stats']['bytes'])
+        if upload is not image:
+            # 局部上传的帧不测量，新布局下要等到第一个整帧才知道节省了多少
+            saved = self.border_trimmer.bytes_saved_per_frame
+            if saved is not None:
+                self.metrics.inc("trim_bytes_saved", saved)
+            saving = f"每帧节省 {saved / 1024:.1f}KB" if saved is not None else "节省字节数待测量"
+            print(f"裁剪边框: {image.width}x{image.height} → {upload.width}x{upload.height}，{saving}")
+
+        request = self.build_request(prompt, images)
+        request['cache_key'] = (model, prompt, image_hash)
+        if delta is not None:
+            request['delta'] = (delta, upload_bytes)
+        return request
+
+    def send(self, request, on_token=None, source="manual"):
+        """发送请求，返回分析结果"""
+        if 'cached' in request:
+            return make_result(request['cached'], source, cached=True)
+
+        start = time.perf_counter()
+        try:
+            content = self.backend_pool.execute(
+                lambda backend, token: self._call_backend(backend, request, token),
+                on_token if self.settings['stream'] else None
+            )
+            elapsed = time.perf_counter() - start
+            self.scheduler.record_latency(elapsed)
+
+            if request.get('cache_key'):
+                self.response_cache.put(*request['cache_key'], content)
+            # 模型确实看到了这一帧，局部上传才以它作为新的比较基准
+            if request.get('delta'):
+                self.delta_cropper.commit(*request['delta'])
+            return make_result(content, source, elapsed=elapsed)
+
+        except CircuitOpenError as e:
+            return make_result(f"服务暂时不可用: {e.text}", source, error=True)
+        except APIError as e:
+            return make_result(f"API请求失败: {e.status_code} - {e.text}", source, error=True,
+                               elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return make_result(f"分析失败: {e}", source, error=True, elapsed=time.perf_counter() - start)
+
+    def _call_backend(self, backend, request, on_token=None):
+        """向指定服务发送请求"""
+        url = f"{backend.base_url}/chat/completions"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {backend.api_key}"
+        }
+        data = dict(request['data'], model=backend.model or request['data']['model'])
+        if on_token:
+            return self.api_client.stream_completion(url, headers, data, on_token)
+        return self.api_client.complete(url, headers, data)
+
+    def analyze(self, image, prompt=None, on_token=None, source="manual"):
+        """分析图像，开启流式输出时每收到一段文本调用on_token"""
+        with self.metrics.span("recognition", source=source):
+            try:
+                request = self.prepare(image, prompt)
+            except Exception as e:
+                return make_result(f"分析失败: {e}", source, error=True)
+            return self.send(request, on_token, source)
+
+    def chat(self, prompt, on_token=None):
+        """纯文本对话"""
+        return self.send(self.build_request(prompt), on_token, source="chat")
+
+    def test_connection(self):
+        """测试API连接，返回(是否成功, 状态码或错误)"""
+        try:
+            response = self.api_client.get(
+                f"{self.settings['base_url']}/models",
+                headers=self.auth_headers(),
+                timeout=10
+            )
+            return response.status_code == 200, response.status_code
+        except Exception as e:
+            return False, e
+
+    # ===================
+    # 监控
+    # ===================
+    @property
+    def monitoring(self):
+        return self.pipeline.running
+
+    def provider_available(self):
+        """是否还有未熔断的服务"""
+        return any(self.api_client.is_available(b.base_url) for b in self.backend_pool.backends)
+
+    def start_monitor(self, on_result=None):
+        """开始监控"""
+        if on_result:
+            self.on_result = on_result
+
+        # 重新开始统计，第一帧总会发送
+        self.scene_detector.reset()
+        self.scheduler.reset()
+        if self.settings['trigger_mode'] and not self.trigger_engine.triggers:
+            print("触发模式下没有可用的触发器，不会发送任何分析")
+
+        # 截图、编码和请求分阶段并行，请求进行中时继续截取下一帧
+        self.pipeline.start()
+
+    def stop_monitor(self):
+        """停止监控"""
+        self.pipeline.stop()
+
+    def iter_results(self, max_results=None):
+        """以迭代器方式监控，逐个产出分析结果"""
+        results = queue.Queue()
+        previous = self.on_result
+        self.on_result = results.put
+        self.start_monitor()
+        try:
+            count = 0
+            while self.monitoring or not results.empty():
+                try:
+                    result = results.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+                yield result
+                count += 1
+                if max_results and count >= max_results:
+                    break
+        finally:
+            self.stop_monitor()
+            self.on_result = previous
+
+    def get_stats(self):
+        """汇总各阶段统计"""
+        return {
+            "scene": self.scene_detector.get_stats(),
+            "capture": self.capture_service.get_stats(),
+            "cache": self.response_cache.get_stats(),
+            "pipeline": self.pipeline.get_stats(),
+            "interval": self.scheduler.next_interval(),
+            "stages": self.metrics.get_summary(),
+            "provider_available": self.provider_available(),
+            "backends": self.backend_pool.get_stats(),
+            "trim": self.border_trimmer.get_stats(),
+            "delta": self.delta_cropper.get_stats(),
+            "triggers": self.trigger_engine.get_stats(),
+        }
+
+    def _capture_stage(self):
+        """流水线截图阶段：读取最新画面，画面未明显变化时跳过"""
+        if self.settings['trigger_mode']:
+            return self._trigger_stage()
+
+        # 服务商熔断期间暂停截图和请求
+        if not self.provider_available():
+            return None
+
+        frame = self.latest_frame()
+        if not frame:
+            return None
+
+        changed = self.scene_detector.check(frame)
+        self.metrics.inc("frames_sent" if changed else "frames_skipped")
+        self.scheduler.record_change(self.scene_detector.last_score)
+        if self.on_frame:
+            self.on_frame(changed)
+        return (frame, None) if changed else None
+
+    def _trigger_stage(self):
+        """触发模式的截图阶段：逐帧匹配模板，有触发器命中时才分析"""
+        with self.metrics.span("capture"):
+            frame = self.capture_service.get_next(self._last_scanned, timeout=1.0)
+        if frame is None:
+            return None
+        self._last_scanned = frame
+        self.border_trimmer.observe(frame)
+
+        with self.metrics.span("trigger_scan"):
+            fired = self.trigger_engine.scan(frame)
+        self.metrics.inc("frames_scanned")
+        if self.on_frame:
+            self.on_frame(bool(fired))
+        # 服务商熔断期间触发也不发送
+        if not fired or not self.provider_available():
+            return None
+
+        self.trigger_engine.start_cooldown(fired)
+        self.metrics.inc("triggers_fired", len(fired))
+        return frame, self.trigger_engine.build_prompt(self.settings['game_prompt'], fired)
+
+    def _encode_stage(self, item):
+        """流水线编码阶段"""
+        frame, prompt = item
+        return self.prepare(frame, prompt)
+
+    def _request_stage(self, request):
+        """流水线请求阶段：发送请求并交给回调"""
+        sink = self.stream_factory() if self.stream_factory else None
+        # 多个请求并行时逐字输出会相互穿插，改为完成后整体显示
+        on_token = sink.write if sink and self.pipeline.max_inflight == 1 else None
+        with self.metrics.span("recognition", source="monitor"):
+            result = self.send(request, on_token, source="monitor")
+        if sink:
+            sink.finish(result['text'])
+        if self.on_result:
+            self.on_result(result)
+        return result
+
+    def _on_pipeline_error(self, error):
+        if self.on_error:
+            self.on_error(error)
+        else:
+            print(f"监控出错: {error}")
+
+
+def parse_region(text):
+    """解析 x,y,w,h"""
+    values = [int(v) for v in text.split(',')]
+    if len(values) != 4:
+        raise argparse.ArgumentTypeError("区域格式应为 x,y,w,h")
+    return values
+
+
+def load_settings(args):
+    """合并config.json和命令行参数"""
+    settings = {}
+    if args.config and os.path.exists(args.config):
+        with open(args.config, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+
+    if args.api_key:
+        settings['api_key'] = args.api_key
+    elif not settings.get('api_key'):
+        settings['api_key'] = os.environ.get('OPENAI_API_KEY', '')
+    if args.base_url:
+        settings['base_url'] = args.base_url
+    if args.model:
+        settings['model'] = args.model
+    if args.prompt:
+        settings['game_prompt'] = args.prompt
+    if args.encode_profile:
+        settings['encode_profile'] = args.encode_profile
+    if args.region:
+        settings['region_mode'] = 'region'
+        settings['selected_region'] = args.region
+    elif 'region_mode' not in settings:
+        settings['region_mode'] = 'fullscreen'
+    if args.metrics_port or args.prometheus_file or args.trace:
+        metrics = dict(settings.get('metrics') or {})
+        if args.metrics_port:
+            metrics['http_port'] = args.metrics_port
+        if args.prometheus_file:
+            metrics['prometheus_file'] = args.prometheus_file
+        if args.trace:
+            metrics['trace'] = True
+            metrics['trace_file'] = args.trace
+        settings['metrics'] = metrics
+    if getattr(args, 'triggers', None):
+        settings['trigger_mode'] = True
+        settings['trigger_profile'] = args.triggers
+    if getattr(args, 'threshold', None) is not None:
+        settings['change_threshold'] = args.threshold
+    if getattr(args, 'interval', None):
+        # 指定间隔时使用固定间隔
+        interval = args.interval
+        settings['scheduler'] = {
+            "initial_interval": interval,
+            "min_interval": interval,
+            "max_interval": interval,
+        }
+    settings['stream'] = False
+    return settings
+
+
+def shared_options(default=None):
+    """命令行的公共选项，放在子命令前后均可"""
+    parser = argparse.ArgumentParser(add_help=False, argument_default=default)
+    parser.add_argument('--config', help="配置文件路径（默认config.json）")
+    parser.add_argument('--api-key', help="API Key（默认读取配置或OPENAI_API_KEY）")
+    parser.add_argument('--base-url', help="OpenAI兼容接口地址")
+    parser.add_argument('--model', help="模型名称")
+    parser.add_argument('--prompt', help="提示词")
+    parser.add_argument('--encode-profile', help="图像编码配置")
+    parser.add_argument('--region', type=parse_region, help="识别区域 x,y,w,h（默认全屏）")
+    parser.add_argument('--metrics-port', type=int, help="在本地端口提供 /metrics 接口")
+    parser.add_argument('--prometheus-file', help="退出时写出Prometheus指标文件")
+    parser.add_argument('--trace', metavar='FILE', help="退出时写出Chrome追踪文件")
+    return parser
+
+
+def main(argv=None):
+    """命令行入口: 结果以JSON行输出到标准输出"""
+    parser = argparse.ArgumentParser(prog="python -m engine", description="AI游戏助手（无界面）",
+                                     parents=[shared_options()])
+    parser.set_defaults(config='config.json')
+    # 子命令中的公共选项不设默认值，避免覆盖写在子命令之前的值
+    shared = shared_options(argparse.SUPPRESS)
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    monitor_parser = commands.add_parser('monitor', help="持续监控并输出建议", parents=[shared])
+    monitor_parser.add_argument('--interval', type=float, help="固定截图间隔(秒)，默认自适应")
+    monitor_parser.add_argument('--threshold', type=float, help="画面变化阈值")
+    monitor_parser.add_argument('--max-results', type=int, help="输出指定条数后退出")
+    monitor_parser.add_argument('--triggers', metavar='PROFILE', help="只在该游戏配置的触发器命中时分析")
+
+    commands.add_parser('analyze', help="分析一次当前画面", parents=[shared])
+
+    capture_parser = commands.add_parser('capture', help="截图并保存", parents=[shared])
+    capture_parser.add_argument('--output', default='screenshot.png', help="输出文件")
+
+    args = parser.parse_args(argv)
+
+    # 标准输出只保留JSON结果，诊断信息改写到标准错误
+    out = sys.stdout
+    sys.stdout = sys.stderr
+
+    def emit(data):
+        out.write(json.dumps(data, ensure_ascii=False) + "\n")
+        out.flush()
+
+    engine = AssistantEngine(load_settings(args))
+    engine.start()
+    try:
+        if args.command == 'capture':
+            frame = engine.capture(engine.get_capture_bounds())
+            if frame is None:
+                emit({"error": True, "text": "截图失败"})
+                return 1
+            frame.save(args.output)
+            emit({"output": args.output, "size": list(frame.size)})
+
+        elif args.command == 'analyze':
+            frame = engine.latest_frame()
+            if frame is None:
+                emit({"error": True, "text": "截图失败"})
+                return 1
+            emit(engine.analyze(frame))
+
+        else:
+            engine.on_error = lambda e: emit({"error": True, "text": f"监控出错: {e}"})
+            for result in engine.iter_results(args.max_results):
+                emit(result)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
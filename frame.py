@@ -0,0 +1,87 @@
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+class Frame:
+    """一帧截图画面
+
+    直接以NumPy视图引用mss截图的BGRA缓冲区，不复制像素。
+    裁剪返回同一缓冲区上的视图；灰度化、缩放和编码在BGRA数据上一次完成，
+    只有需要PIL图像时(预览、拼接、保存)才转换。
+    提供与PIL.Image相同的 size/width/height/crop/resize/copy/save 接口。
+    """
+
+    def __init__(self, bgra):
+        self.bgra = bgra  # (高, 宽, 4) uint8，可以是其它数组的视图
+
+    @classmethod
+    def from_screenshot(cls, screenshot):
+        """包装mss的截图结果（引用其raw缓冲区）"""
+        width, height = screenshot.size
+        return cls(np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(height, width, 4))
+
+    @property
+    def width(self):
+        return self.bgra.shape[1]
+
+    @property
+    def height(self):
+        return self.bgra.shape[0]
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def crop(self, box):
+        """裁剪 (left, top, right, bottom)，返回视图"""
+        left, top, right, bottom = (int(v) for v in box)
+        return Frame(self.bgra[max(0, top):max(0, bottom), max(0, left):max(0, right)])
+
+    def resize(self, size, resample=None, reducing_gap=None):
+        """缩放到size（面积插值；resample等参数仅为兼容PIL接口）"""
+        if tuple(size) == self.size:
+            return self
+        return Frame(cv2.resize(self.bgra, tuple(size), interpolation=cv2.INTER_AREA))
+
+    def copy(self):
+        return Frame(self.bgra.copy())
+
+    def gray(self):
+        return cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2GRAY)
+
+    def bgr(self):
+        return cv2.cvtColor(self.bgra, cv2.COLOR_BGRA2BGR)
+
+    def to_pil(self):
+        """转换为RGB的PIL图像（复制一次）"""
+        return Image.frombuffer("RGB", self.size, np.ascontiguousarray(self.bgra), "raw", "BGRX", 0, 1)
+
+    def save(self, fp, format=None, **params):
+        self.to_pil().save(fp, format, **params)
+
+
+def to_pil(image):
+    """Frame转换为PIL图像，PIL图像原样返回"""
+    return image.to_pil() if isinstance(image, Frame) else image
+
+
+def to_gray(image):
+    """Frame或PIL图像转换为灰度数组"""
+    if isinstance(image, Frame):
+        return image.gray()
+    frame = np.asarray(image)
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2GRAY if frame.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    return frame
+
+
+def gray_thumbnail(image, width):
+    """缩小到指定宽度的灰度图（Frame先缩小再转灰度，避免转换整幅画面）"""
+    scale = min(1.0, width / float(image.width))
+    size = (max(1, int(round(image.width * scale))), max(1, int(round(image.height * scale))))
+    if isinstance(image, Frame):
+        return cv2.cvtColor(cv2.resize(image.bgra, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGRA2GRAY)
+    return cv2.resize(to_gray(image), size, interpolation=cv2.INTER_AREA)
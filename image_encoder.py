@@ -0,0 +1,154 @@
+import base64
+import io
+import time
+
+from frame import Frame
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+Image = lazy_import("PIL.Image")
+features = lazy_import("PIL.features")
+
+
+# 内置编码配置: 格式、质量、最长边(0表示不缩放)
+ENCODE_PROFILES = {
+    "原图PNG": {"format": "png", "quality": 100, "max_edge": 0},
+    "高清JPEG": {"format": "jpeg", "quality": 90, "max_edge": 1920},
+    "均衡JPEG": {"format": "jpeg", "quality": 80, "max_edge": 1280},
+    "省流WebP": {"format": "webp", "quality": 70, "max_edge": 1024},
+}
+
+DEFAULT_PROFILE = "均衡JPEG"
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+class ImageEncoder:
+    """上传图像编码器
+
+    按配置缩放（保持宽高比）并编码为 PNG/JPEG/WebP，
+    记录每帧编码后的字节数和编码耗时。截图画面(Frame)由OpenCV
+    直接从BGRA缓冲区缩放编码，其它图像使用PIL。
+    """
+
+    def __init__(self, profile=DEFAULT_PROFILE, profiles=None):
+        self.profiles = dict(ENCODE_PROFILES)
+        if profiles:
+            self.profiles.update(profiles)
+        self.profile = profile if profile in self.profiles else DEFAULT_PROFILE
+        self.last_stats = None
+
+    def set_profile(self, profile):
+        """切换编码配置"""
+        if profile in self.profiles:
+            self.profile = profile
+
+    def get_settings(self):
+        """获取当前编码配置"""
+        settings = dict(self.profiles[self.profile])
+        fmt = settings.get("format", "png").lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        # Pillow未编译WebP支持时退回JPEG
+        if fmt == "webp" and not features.check("webp"):
+            fmt = "jpeg"
+        settings["format"] = fmt
+        return settings
+
+    @staticmethod
+    def fit_size(width, height, max_edge):
+        """按最长边等比缩放后的尺寸"""
+        if not max_edge or max(width, height) <= max_edge:
+            return width, height
+        scale = max_edge / float(max(width, height))
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    @staticmethod
+    def _encode_frame(frame, fmt, quality):
+        """直接从BGRA数据编码，失败时返回None"""
+        if fmt == "png":
+            ext, params, pixels = ".png", [cv2.IMWRITE_PNG_COMPRESSION, 6], frame.bgr()
+        elif fmt == "webp":
+            ext, params, pixels = ".webp", [cv2.IMWRITE_WEBP_QUALITY, quality], frame.bgr()
+        else:
+            # JPEG编码器逐行丢弃第4通道，无需先转换整幅画面
+            ext, params, pixels = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, quality], frame.bgra
+        try:
+            ok, buffer = cv2.imencode(ext, pixels, params)
+        except cv2.error:
+            return None
+        return buffer.tobytes() if ok else None
+
+    @staticmethod
+    def _encode_pil(image, size, fmt, quality):
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        if fmt != "png" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        buffered = io.BytesIO()
+        if fmt == "png":
+            image.save(buffered, format="PNG")
+        elif fmt == "webp":
+            image.save(buffered, format="WEBP", quality=quality, method=4)
+        else:
+            image.save(buffered, format="JPEG", quality=quality, optimize=False)
+        return buffered.getvalue()
+
+    def encode(self, image):
+        """编码图像，返回包含数据和统计信息的字典"""
+        settings = self.get_settings()
+        fmt = settings["format"]
+        quality = int(settings.get("quality", 80))
+
+        start = time.perf_counter()
+
+        size = self.fit_size(image.width, image.height, settings.get("max_edge", 0))
+        data = None
+        if isinstance(image, Frame):
+            # 截图画面：在BGRA数据上缩小、转换颜色并编码，不经过PIL
+            image = image.resize(size)
+            data = self._encode_frame(image, fmt, quality)
+            if data is None:
+                image = image.to_pil()
+        if data is None:
+            data = self._encode_pil(image, size, fmt, quality)
+
+        encode_time = time.perf_counter() - start
+
+        self.last_stats = {
+            "profile": self.profile,
+            "format": fmt,
+            "size": size,
+            "bytes": len(data),
+            "encode_ms": encode_time * 1000,
+        }
+        return {
+            "data": data,
+            "mime": MIME_TYPES[fmt],
+            "stats": self.last_stats,
+        }
+
+    @staticmethod
+    def data_url(encoded):
+        """将encode()的结果转换为data URL"""
+        image_base64 = base64.b64encode(encoded["data"]).decode('utf-8')
+        return f"data:{encoded['mime']};base64,{image_base64}"
+
+    def to_data_url(self, image):
+        """编码并转换为data URL"""
+        return self.data_url(self.encode(image))
+
+    def format_stats(self, stats=None):
+        """格式化编码统计"""
+        stats = stats or self.last_stats
+        if not stats:
+            return ""
+        width, height = stats["size"]
+        return (f"{stats['format'].upper()} {width}x{height} "
+                f"{stats['bytes'] / 1024:.1f}KB {stats['encode_ms']:.1f}ms")
@@ -0,0 +1,54 @@
+import importlib
+import threading
+
+
+class LazyModule:
+    """首次访问属性时才导入的模块
+
+    cv2、numpy、PIL、requests、mss 等导入较慢，模块顶层写成
+    cv2 = lazy_import("cv2") 后，只有真正用到时才加载，程序窗口可以先显示出来。
+    importlib.import_module 自带按模块加锁，可在多个线程中同时访问。
+    PyInstaller 无法从字符串中分析出依赖，打包时需要在 build.py 和
+    .github/workflows/build.yml 中声明 hidden import。
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "已加载" if self._module is not None else "未加载"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name):
+    """返回延迟导入的模块"""
+    return LazyModule(name)
+
+
+# 界面显示后在后台预先加载的模块，加载后第一次截图、识别不必再等待导入
+HEAVY_MODULES = ("numpy", "cv2", "PIL.Image", "PIL.ImageTk", "requests", "mss")
+
+
+def warm_up(names=HEAVY_MODULES, on_done=None):
+    """在后台线程中依次导入模块，返回线程"""
+    def run():
+        for name in names:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"预加载 {name} 失败: {e}")
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
@@ -4,13 +4,24 @@ import threading
 import time
 import json
 import os
-import base64
-import requests
 from datetime import datetime
-import pyautogui
-from PIL import Image, ImageTk
 import random
-import io
+import lazy_import
+from image_encoder import DEFAULT_PROFILE
+from api_client import DEFAULT_HTTP_SETTINGS
+from stream_view import TextStreamWriter
+from response_cache import DEFAULT_CACHE_SETTINGS
+from adaptive_scheduler import DEFAULT_SCHEDULER_SETTINGS
+from metrics import DEFAULT_METRICS_SETTINGS
+from diary_writer import DiaryWriter, DEFAULT_DIARY_SETTINGS
+from diary_store import DiaryStore
+from diary_pager import DiaryPager
+from conversation_memory import ConversationMemory, DEFAULT_MEMORY_SETTINGS
+from rate_limiter import DEFAULT_RATE_LIMIT_SETTINGS
+from backend_pool import DEFAULT_FAILOVER_SETTINGS
+from border_trimmer import DEFAULT_TRIM_SETTINGS
+from delta_crop import DEFAULT_DELTA_SETTINGS
+from engine import AssistantEngine
 
 class GameAIAssistant:
     def __init__(self, root):
@@ -31,6 +42,38 @@ class GameAIAssistant:
         # 运行状态
         self.is_monitoring = False
         self.last_comment_time = time.time()
+        self.monitor_stop = threading.Event()
+        
+        # 核心引擎（全屏截图、编码、缓存和API调用）
+        self.engine = AssistantEngine({
+            "api_key": self.config["openrouter_api_key"],
+            "base_url": "https://openrouter.ai/api/v1",
+            "model": self.config["current_model"],
+            "stream": self.config["stream"],
+            "capture_fps": self.config["capture_fps"],
+            "encode_profile": self.config["encode_profile"],
+            "encode_profiles": self.config["encode_profiles"],
+            "http": self.config["http"],
+            "cache": self.config["cache"],
+            "scheduler": self.config["scheduler"],
+            "metrics": self.config["metrics"],
+            "rate_limit": self.config["rate_limit"],
+            "backends": self.config["backends"],
+            "failover": self.config["failover"],
+            "trim": self.config["trim"],
+            "delta_upload": self.config["delta_upload"],
+            "delta": self.config["delta"],
+        })
+        
+        # 按token预算滚动的对话记忆
+        self.memory = ConversationMemory(self.config["memory"])
+        
+        # 后台日记写入线程，界面和分析线程不等待磁盘
+        self.diary_writer = DiaryWriter(self.diary_folder, self.config["diary"])
+        self.diary_writer.start()
+        
+        # 日记全文索引
+        self.diary_store = DiaryStore(self.diary_folder)
         
         # 创建UI
         self.create_ui()
@@ -38,6 +81,15 @@ class GameAIAssistant:
         # 启动监控线程
         self.monitor_thread = None
         
+        # 窗口显示后再启动截图服务、预热连接并在后台加载cv2等较慢的模块
+        self.warmed_up = threading.Event()
+        self.root.after(100, self.warm_up)
+        
+    def warm_up(self):
+        """启动截图服务并预热到服务商的连接，在后台预加载较慢的模块"""
+        self.engine.start()
+        lazy_import.warm_up(on_done=self.warmed_up.set)
+        
     def load_config(self):
         """加载配置文件"""
         default_config = {
@@ -48,6 +100,22 @@ class GameAIAssistant:
                 "random_probability": 15,  # 15%概率主动吐槽
                 "silence_timeout": 30      # 30秒无对话时主动发言
             },
+            "capture_fps": 1.0,  # 后台截图帧率
+            "encode_profile": DEFAULT_PROFILE,  # 上传图像编码配置
+            "encode_profiles": {},  # 自定义编码配置 {名称: {format, quality, max_edge}}
+            "http": dict(DEFAULT_HTTP_SETTINGS),  # 连接池和超时设置
+            "stream": True,  # 流式输出AI回复
+            "cache": dict(DEFAULT_CACHE_SETTINGS),  # 相似画面的回复缓存
+            "scheduler": dict(DEFAULT_SCHEDULER_SETTINGS),  # 自适应监控间隔
+            "metrics": dict(DEFAULT_METRICS_SETTINGS),  # 各阶段耗时统计和追踪导出
+            "diary": dict(DEFAULT_DIARY_SETTINGS),  # 自动日记的批量写入设置
+            "memory": dict(DEFAULT_MEMORY_SETTINGS),  # 对话记忆的token预算
+            "rate_limit": dict(DEFAULT_RATE_LIMIT_SETTINGS),  # 限流、重试和熔断
+            "backends": [],  # OpenRouter之外的备用服务 [{name, base_url, api_key, model}]
+            "failover": dict(DEFAULT_FAILOVER_SETTINGS),  # 故障转移和对冲请求
+            "trim": dict(DEFAULT_TRIM_SETTINGS),  # 上传前裁掉黑边和任务栏等静止边框
+            "delta_upload": False,  # 只上传变化区域和整体缩略图
+            "delta": dict(DEFAULT_DELTA_SETTINGS),  # 局部上传的阈值设置
             "models": [
                 "openai/gpt-4-vision-preview",
                 "openai/gpt-4o",
@@ -145,6 +213,14 @@ class GameAIAssistant:
         self.model_combo.pack(fill='x', pady=(0, 10))
         self.model_combo.set(self.config.get("current_model", ""))
         
+        ttk.Label(api_frame, text="图像编码:").pack(anchor='w')
+        self.encode_combo = ttk.Combobox(api_frame, values=list(self.engine.image_encoder.profiles), state='readonly')
+        self.encode_combo.pack(fill='x', pady=(0, 10))
+        self.encode_combo.set(self.engine.image_encoder.profile)
+        
+        self.stream_var = tk.BooleanVar(value=self.config["stream"])
+        ttk.Checkbutton(api_frame, text="流式输出（边生成边显示）", variable=self.stream_var).pack(anchor='w')
+        
         # AI人设配置
         personality_frame = ttk.LabelFrame(parent, text="AI人设配置", padding=10)
         personality_frame.pack(fill='both', expand=True, padx=5, pady=5)
@@ -200,6 +276,24 @@ class GameAIAssistant:
         ttk.Button(btn_frame, text="刷新列表", command=self.refresh_diary_list).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="导出日记", command=self.export_diary).pack(side='left', padx=5)
         
+        # 日记搜索
+        search_frame = ttk.LabelFrame(parent, text="日记搜索", padding=10)
+        search_frame.pack(fill='x', padx=5, pady=5)
+        
+        search_bar = ttk.Frame(search_frame)
+        search_bar.pack(fill='x', pady=(0, 5))
+        self.diary_search_entry = ttk.Entry(search_bar)
+        self.diary_search_entry.pack(side='left', fill='x', expand=True)
+        self.diary_search_entry.bind('<Return>', self.search_diaries)
+        ttk.Button(search_bar, text="搜索", command=self.search_diaries).pack(side='left', padx=5)
+        self.diary_search_info = ttk.Label(search_bar, text="")
+        self.diary_search_info.pack(side='left')
+        
+        self.diary_search_results = tk.Listbox(search_frame, height=5)
+        self.diary_search_results.pack(fill='x')
+        self.diary_search_results.bind('<Double-1>', self.open_search_result)
+        self.search_hits = []
+        
         # 日记编辑区域
         edit_frame = ttk.LabelFrame(parent, text="日记内容", padding=10)
         edit_frame.pack(fill='both', expand=True, padx=5, pady=5)
@@ -214,6 +308,9 @@ class GameAIAssistant:
         # 日记内容
         self.diary_content = scrolledtext.ScrolledText(edit_frame, height=15)
         self.diary_content.pack(fill='both', expand=True, pady=(0, 5))
+        # 滚动到顶部时加载更早的内容
+        self.diary_content.config(yscrollcommand=self.on_diary_scroll)
+        self.diary_pager = None
         
         # 保存按钮
         ttk.Button(edit_frame, text="保存日记", command=self.save_diary).pack(anchor='e')
@@ -233,6 +330,14 @@ class GameAIAssistant:
         """保存设置"""
         self.config["openrouter_api_key"] = self.api_key_entry.get()
         self.config["current_model"] = self.model_combo.get()
+        self.config["encode_profile"] = self.encode_combo.get()
+        self.config["stream"] = self.stream_var.get()
+        self.engine.update_settings(
+            api_key=self.config["openrouter_api_key"],
+            model=self.config["current_model"],
+            encode_profile=self.config["encode_profile"],
+            stream=self.config["stream"]
+        )
         self.config["ai_personality"] = self.personality_text.get('1.0', 'end-1c')
         self.config["comment_frequency"]["random_probability"] = int(self.prob_scale.get())
         self.config["comment_frequency"]["silence_timeout"] = int(self.timeout_scale.get())
@@ -251,23 +356,31 @@ class GameAIAssistant:
             self.start_btn.config(text="停止监控")
             self.status_label.config(text="状态: 监控中...")
             
+            self.engine.scheduler.reset()
+            self.engine.activity_detector.reset()
+            
             # 启动监控线程
-            self.monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
+            self.monitor_stop = threading.Event()
+            self.monitor_thread = threading.Thread(target=self.monitoring_loop, args=(self.monitor_stop,), daemon=True)
             self.monitor_thread.start()
             
             self.add_chat_message("系统", "AI游戏助手已启动!", "system")
         else:
             self.is_monitoring = False
+            self.monitor_stop.set()
             self.start_btn.config(text="开始监控")
             self.status_label.config(text="状态: 已停止")
             self.add_chat_message("系统", "AI游戏助手已停止!", "system")
     
-    def monitoring_loop(self):
+    def monitoring_loop(self, stop):
         """监控循环"""
-        while self.is_monitoring:
+        while not stop.is_set():
             try:
                 current_time = time.time()
                 
+                # 衡量画面活跃程度，用于调整检查间隔
+                self.engine.sample_activity()
+                
                 # 检查是否需要主动发言
                 should_comment = False
                 
@@ -279,33 +392,34 @@ class GameAIAssistant:
                 if current_time - self.last_comment_time >= self.config["comment_frequency"]["silence_timeout"]:
                     should_comment = True
                 
+                # 服务商熔断期间暂停主动发言
+                if should_comment and not self.engine.provider_available():
+                    should_comment = False
+                
                 if should_comment:
                     self.analyze_screen(auto_comment=True)
                     self.last_comment_time = current_time
                 
-                time.sleep(5)  # 每5秒检查一次
+                # 画面激烈时缩短间隔，静止时逐步延长
+                self.update_status_bar()
+                stop.wait(self.engine.scheduler.next_interval())
                 
             except Exception as e:
                 print(f"监控循环错误: {e}")
-                time.sleep(5)
+                stop.wait(5)
     
     def manual_analyze(self):
         """手动分析屏幕"""
-        self.analyze_screen(auto_comment=False)
+        # 在后台分析，避免阻塞界面和流式输出
+        threading.Thread(target=self.analyze_screen, args=(False,), daemon=True).start()
     
     def analyze_screen(self, auto_comment=True):
         """分析屏幕内容"""
         try:
-            # 截图
-            screenshot = pyautogui.screenshot()
-            
-            # 压缩图片以减少API调用成本
-            screenshot = screenshot.resize((800, 600), Image.Resampling.LANCZOS)
-            
-            # 转换为base64
-            buffered = io.BytesIO()
-            screenshot.save(buffered, format="PNG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode()
+            # 读取截图服务中的最新画面
+            screenshot = self.engine.latest_frame()
+            if screenshot is None:
+                raise RuntimeError("截图失败")
             
             # 构建prompt
             if auto_comment:
@@ -313,59 +427,38 @@ class GameAIAssistant:
             else:
                 prompt = f"{self.config['ai_personality']}\n\n请详细分析这个游戏画面，描述你看到的内容和你的想法。"
             
-            # 调用API
-            response = self.call_openrouter_api(prompt, image_base64)
+            stream = self.create_chat_stream("AI助手")
             
-            if response:
-                message_type = "auto" if auto_comment else "analysis"
-                self.add_chat_message("AI助手", response, message_type)
-                
-                # 自动保存到日记
-                self.auto_save_to_diary(f"AI分析: {response}")
-                
-        except Exception as e:
-            self.add_chat_message("系统", f"分析失败: {str(e)}", "error")
-    
-    def call_openrouter_api(self, prompt, image_base64=None):
-        """调用OpenRouter API"""
-        try:
-            headers = {
-                "Authorization": f"Bearer {self.config['openrouter_api_key']}",
-                "Content-Type": "application/json"
-            }
+            # 引擎负责缓存查询、图像编码和API调用
+            result = self.engine.analyze(screenshot, prompt=prompt, on_token=stream.write)
+            stream.finish(result['text'])
+            self.update_status_bar()
             
-            messages = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt}
-                    ]
-                }
-            ]
-            
-            if image_base64:
-                messages[0]["content"].append({
-                    "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{image_base64}"}
-                })
-            
-            data = {
-                "model": self.config["current_model"],
-                "messages": messages,
-                "max_tokens": 500
-            }
+            if not result['error']:
+                self.memory.set_analysis(result['text'])
             
-            response = requests.post("https://openrouter.ai/api/v1/chat/completions", 
-                                   headers=headers, json=data, timeout=30)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result["choices"][0]["message"]["content"]
-            else:
-                return f"API调用失败: {response.status_code}"
+            # 自动保存到日记（缓存命中的回复已经保存过）
+            if not result['error'] and not result['cached']:
+                self.auto_save_to_diary(f"AI分析: {result['text']}")
                 
         except Exception as e:
-            return f"API调用出错: {str(e)}"
+            self.add_chat_message("系统", f"分析失败: {str(e)}", "error")
+    
+    def update_status_bar(self):
+        """在状态栏显示缓存命中率和当前监控间隔"""
+        stats = self.engine.response_cache.get_stats()
+        state = f"监控中 (间隔 {self.engine.scheduler.next_interval():.1f}s)" if self.is_monitoring else "空闲"
+        text = f"状态: {state} | 缓存命中 {stats['hits']}/{stats['hits'] + stats['misses']} ({stats['hit_rate']:.0%})"
+        if not self.engine.provider_available():
+            text += " | 服务熔断中，已暂停"
+        backend_stats = self.engine.backend_pool.get_stats()
+        if len(backend_stats["backends"]) > 1:
+            wins = " ".join(f"{name} {item['win_rate']:.0%}" for name, item in backend_stats["backends"].items())
+            text += f" | 服务 {wins} 对冲 {backend_stats['hedge_rate']:.0%}"
+        trim_stats = self.engine.border_trimmer.get_stats()
+        if trim_stats["box"]:
+            text += f" | 裁边 每帧省 {trim_stats['bytes_saved_per_frame'] / 1024:.0f}KB"
+        self.root.after(0, lambda: self.status_label.config(text=text))
     
     def send_message(self, event=None):
         """发送用户消息"""
@@ -385,20 +478,27 @@ class GameAIAssistant:
     def process_user_message(self, message):
         """处理用户消息"""
         try:
-            # 构建上下文prompt
-            prompt = f"{self.config['ai_personality']}\n\n用户说: {message}\n\n请回复用户。如果用户询问游戏相关问题，可以要求截图分析。"
+            # 构建带对话记忆的prompt
+            prompt = self.memory.build_prompt(self.config['ai_personality'], message)
             
-            response = self.call_openrouter_api(prompt)
+            stream = self.create_chat_stream("AI助手")
+            result = self.engine.chat(prompt, on_token=stream.write)
+            stream.finish(result['text'])
             
-            if response:
-                self.add_chat_message("AI助手", response, "ai")
+            if not result['error']:
+                self.memory.add_turn(message, result['text'])
                 
                 # 自动保存对话到日记
-                self.auto_save_to_diary(f"用户: {message}\nAI: {response}")
+                self.auto_save_to_diary(f"用户: {message}\nAI: {result['text']}")
                 
         except Exception as e:
             self.add_chat_message("系统", f"处理消息失败: {str(e)}", "error")
     
+    def create_chat_stream(self, sender):
+        """创建流式聊天输出"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        return TextStreamWriter(self.root, self.chat_display, header=f"[{timestamp}] {sender}: ")
+    
     def add_chat_message(self, sender, message, msg_type):
         """添加聊天消息"""
         self.chat_display.config(state='normal')
@@ -422,15 +522,68 @@ class GameAIAssistant:
         self.chat_display.config(state='disabled')
     
     def refresh_diary_list(self):
-        """刷新日记列表"""
+        """刷新日记列表（后台增量更新索引）"""
+        def refresh():
+            self.diary_writer.flush()
+            self.diary_store.sync()
+            names = self.diary_store.list_diaries()
+            self.root.after(0, lambda: self.show_diary_list(names))
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def show_diary_list(self, names):
+        """显示日记列表"""
         self.diary_listbox.delete(0, tk.END)
-        if os.path.exists(self.diary_folder):
-            for filename in os.listdir(self.diary_folder):
-                if filename.endswith('.txt'):
-                    self.diary_listbox.insert(tk.END, filename[:-4])  # 去掉.txt后缀
+        for name in names:
+            self.diary_listbox.insert(tk.END, name)
+    
+    def search_diaries(self, event=None):
+        """全文搜索日记"""
+        query = self.diary_search_entry.get().strip()
+        if not query:
+            return
+        
+        def search():
+            self.diary_writer.flush()
+            self.diary_store.sync()
+            hits = self.diary_store.search(query)
+            elapsed = self.diary_store.last_search_ms
+            self.root.after(0, lambda: self.show_search_results(hits, elapsed))
+        
+        threading.Thread(target=search, daemon=True).start()
+    
+    def show_search_results(self, hits, elapsed):
+        """显示搜索结果"""
+        self.search_hits = hits
+        self.diary_search_results.delete(0, tk.END)
+        for hit in hits:
+            when = hit['ts'] or hit['name']
+            self.diary_search_results.insert(tk.END, f"[{when}] {hit['snippet']}")
+        self.diary_search_info.config(text=f"{len(hits)}条 {elapsed:.1f}ms")
+    
+    def open_search_result(self, event=None):
+        """打开搜索结果所在的日记并定位"""
+        selection = self.diary_search_results.curselection()
+        if not selection:
+            return
+        hit = self.search_hits[selection[0]]
+        anchor = f"[{hit['ts']}]" if hit['ts'] else self.diary_search_entry.get().split()[0]
+        self.open_diary(hit['name'], on_loaded=lambda: self.locate_in_diary(anchor))
+    
+    def locate_in_diary(self, anchor):
+        """定位到该条记录，不在已加载部分时继续向前加载"""
+        pos = self.diary_content.search(anchor, '1.0', tk.END)
+        while not pos and self.load_previous_page():
+            pos = self.diary_content.search(anchor, '1.0', tk.END)
+        if pos:
+            self.diary_content.see(pos)
+            self.diary_content.tag_remove('search_hit', '1.0', tk.END)
+            self.diary_content.tag_add('search_hit', pos, f"{pos} lineend")
+            self.diary_content.tag_config('search_hit', background='yellow')
     
     def new_diary(self):
         """新建日记"""
+        self.diary_pager = None
         today = datetime.now().strftime("%Y-%m-%d")
         self.diary_title.delete(0, tk.END)
         self.diary_title.insert(0, f"游戏日记_{today}")
@@ -443,62 +596,103 @@ class GameAIAssistant:
         if not selection:
             return
         
-        filename = self.diary_listbox.get(selection[0]) + '.txt'
+        self.open_diary(self.diary_listbox.get(selection[0]))
+    
+    def open_diary(self, name, on_loaded=None):
+        """打开指定日记（后台读取，完成后显示并调用on_loaded）"""
+        filename = name + '.txt'
         filepath = os.path.join(self.diary_folder, filename)
         
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                content = f.read()
-                # 分离标题和内容
-                lines = content.split('\n', 1)
-                title = lines[0].replace('标题: ', '') if lines else filename[:-4]
-                content = lines[1] if len(lines) > 1 else content
-                
-                self.diary_title.delete(0, tk.END)
-                self.diary_title.insert(0, title)
-                self.diary_content.delete('1.0', tk.END)
-                self.diary_content.insert('1.0', content)
-        except Exception as e:
-            messagebox.showerror("错误", f"加载日记失败: {str(e)}")
+        def load():
+            try:
+                # 先写入缓冲中的自动日记，只读取标题和最后一页，更早的内容在向上滚动时加载
+                self.diary_writer.flush()
+                pager = DiaryPager(filepath)
+                content = pager.read_tail()
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror("错误", f"加载日记失败: {error}"))
+                return
+            self.root.after(0, lambda: self.show_diary(pager, filename[:-4], content, on_loaded))
+        
+        threading.Thread(target=load, daemon=True).start()
+    
+    def show_diary(self, pager, default_title, content, on_loaded=None):
+        """显示读取好的日记"""
+        self.diary_pager = pager
+        title = pager.title.replace('标题: ', '') or default_title
+        self.diary_title.delete(0, tk.END)
+        self.diary_title.insert(0, title)
+        self.diary_content.delete('1.0', tk.END)
+        self.diary_content.insert('1.0', content)
+        self.diary_content.see(tk.END)
+        if on_loaded:
+            on_loaded()
+    
+    def on_diary_scroll(self, first, last):
+        """日记滚动时更新滚动条，到达顶部时加载上一页"""
+        self.diary_content.vbar.set(first, last)
+        if float(first) <= 0.0 and self.diary_pager and not self.diary_pager.at_start:
+            self.root.after_idle(self.load_previous_page)
+    
+    def load_previous_page(self):
+        """在日记开头插入更早的一页，返回是否加载了内容"""
+        if not self.diary_pager or self.diary_pager.at_start:
+            return False
+        text = self.diary_pager.read_previous()
+        if not text:
+            return False
+        self.diary_content.insert('1.0', text)
+        # 保持当前可见内容的位置不变
+        lines = text.count('\n')
+        self.diary_content.yview(f"{lines + 1}.0")
+        return True
     
     def save_diary(self):
-        """保存日记"""
+        """保存日记（后台写入）"""
         title = self.diary_title.get().strip()
-        content = self.diary_content.get('1.0', 'end-1c')
-        
         if not title:
             messagebox.showerror("错误", "请输入日记标题!")
             return
         
-        filename = f"{title}.txt"
-        filepath = os.path.join(self.diary_folder, filename)
+        content = self.diary_content.get('1.0', 'end-1c')
+        pager = self.diary_pager
+        filepath = os.path.join(self.diary_folder, f"{title}.txt")
+        same_file = pager and os.path.basename(pager.path) == f"{title}.txt"
         
-        try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(f"标题: {title}\n{content}")
-            messagebox.showinfo("成功", "日记已保存!")
-            self.refresh_diary_list()
-        except Exception as e:
-            messagebox.showerror("错误", f"保存日记失败: {str(e)}")
+        def save():
+            new_text = ""
+            try:
+                self.diary_writer.flush()
+                body = content
+                if pager:
+                    # 尚未加载的前部内容原样保留（另存为新标题时同样需要），
+                    # 打开后自动写入的记录追加在末尾，避免保存时被覆盖
+                    new_text = pager.read_new()
+                    body = pager.read_unloaded() + content + new_text
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write(f"标题: {title}\n{body}")
+                if same_file:
+                    pager.end = os.path.getsize(filepath)
+            except Exception as e:
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror("错误", f"保存日记失败: {error}"))
+                return
+            self.root.after(0, lambda: self.diary_saved(pager, new_text))
+        
+        threading.Thread(target=save, daemon=True).start()
+    
+    def diary_saved(self, pager, new_text):
+        """保存完成：在编辑区补上新写入的记录"""
+        if new_text and pager is self.diary_pager:
+            self.diary_content.insert(tk.END, new_text)
+            self.diary_content.see(tk.END)
+        messagebox.showinfo("成功", "日记已保存!")
+        self.refresh_diary_list()
     
     def auto_save_to_diary(self, content):
-        """自动保存内容到今日日记"""
-        today = datetime.now().strftime("%Y-%m-%d")
-        filename = f"游戏日记_{today}.txt"
-        filepath = os.path.join(self.diary_folder, filename)
-        
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        entry = f"\n[{timestamp}] {content}\n"
-        
-        try:
-            # 如果文件存在，追加内容；否则创建新文件
-            mode = 'a' if os.path.exists(filepath) else 'w'
-            with open(filepath, mode, encoding='utf-8') as f:
-                if mode == 'w':
-                    f.write(f"标题: 游戏日记_{today}\n日期: {today}\n\n")
-                f.write(entry)
-        except Exception as e:
-            print(f"自动保存日记失败: {e}")
+        """自动保存内容到今日日记（由后台线程批量写入）"""
+        self.diary_writer.write(content)
     
     def export_diary(self):
         """导出日记"""
@@ -516,20 +710,37 @@ class GameAIAssistant:
             initialvalue=f"{filename}.txt"
         )
         
-        if export_path:
+        if not export_path:
+            return
+        
+        def export():
             try:
+                self.diary_writer.flush()
                 with open(source_path, 'r', encoding='utf-8') as src:
                     content = src.read()
                 with open(export_path, 'w', encoding='utf-8') as dst:
                     dst.write(content)
-                messagebox.showinfo("成功", "日记导出成功!")
             except Exception as e:
-                messagebox.showerror("错误", f"导出失败: {str(e)}")
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror("错误", f"导出失败: {error}"))
+                return
+            self.root.after(0, lambda: messagebox.showinfo("成功", "日记导出成功!"))
+        
+        threading.Thread(target=export, daemon=True).start()
 
 def main():
     root = tk.Tk()
     app = GameAIAssistant(root)
+    if os.environ.get("STARTUP_PROBE"):
+        # 启动时间测试(startup_benchmark.py)：记录窗口显示和预加载完成的时间后退出
+        from startup_probe import install_probe
+        install_probe(root, app.warmed_up)
     root.mainloop()
+    
+    # 退出时停止截图服务、保存回复缓存并写完日记
+    app.engine.close()
+    app.diary_writer.close()
+    app.diary_store.close()
 
 if __name__ == "__main__":
     main()
@@ -1,16 +1,12 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import pyautogui
-import requests
-import base64
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import json
 import os
-import time
 import threading
-from PIL import Image, ImageTk, ImageDraw
-import mss
-import cv2
-import numpy as np
+import lazy_import
+from engine import AssistantEngine
+from region_preview import LivePreview
+from result_log import ResultLog
 
 # 导入Windows API用于窗口置顶
 try:
@@ -30,11 +26,28 @@ class RegionSelector:
         self.end_y = None
         self.rect_id = None
         self.selecting = False
+        self.multi_mode = False  # 是否为多区域编辑模式
+        self.regions = []  # 多区域模式下的命名区域 [{'name': ..., 'region': [x, y, w, h]}]
         
     def select_region(self, callback=None):
         """选择屏幕区域"""
         self.callback = callback
+        self.multi_mode = False
+        self.open_selector("拖拽鼠标选择区域，ESC取消")
+    
+    def select_regions(self, callback=None, regions=None):
+        """编辑多个命名区域：拖拽添加，右键删除，回车确认"""
+        self.callback = callback
+        self.multi_mode = True
+        self.regions = [{'name': item['name'], 'region': list(item['region'])} for item in (regions or [])]
+        self.open_selector("拖拽添加区域，右键删除区域，回车确认，ESC取消")
         
+        self.canvas.bind('<Button-3>', self.remove_region_at)
+        self.canvas.bind('<Return>', lambda e: self.finish_regions())
+        self.draw_regions()
+    
+    def open_selector(self, hint):
+        """创建全屏选择窗口"""
         # 创建全屏透明窗口
         self.selector_window = tk.Toplevel()
         self.selector_window.attributes('-fullscreen', True)
@@ -63,11 +76,37 @@ class RegionSelector:
         self.canvas.create_text(
             self.selector_window.winfo_screenwidth()//2,
             50,
-            text="拖拽鼠标选择区域，ESC取消",
+            text=hint,
             fill='white',
             font=('Arial', 16)
         )
     
+    def draw_regions(self):
+        """绘制已添加的区域"""
+        self.canvas.delete('region')
+        for item in self.regions:
+            x, y, w, h = item['region']
+            self.canvas.create_rectangle(x, y, x + w, y + h, outline='lime', width=2, tags='region')
+            self.canvas.create_text(
+                x + 4, y + 4, text=item['name'], anchor='nw',
+                fill='lime', font=('Arial', 12), tags='region'
+            )
+    
+    def remove_region_at(self, event):
+        """删除鼠标位置处的区域"""
+        for item in reversed(self.regions):
+            x, y, w, h = item['region']
+            if x <= event.x <= x + w and y <= event.y <= y + h:
+                self.regions.remove(item)
+                break
+        self.draw_regions()
+    
+    def finish_regions(self):
+        """完成多区域编辑"""
+        self.selector_window.destroy()
+        if self.callback:
+            self.callback(self.regions)
+    
     def start_selection(self, event):
         """开始选择"""
         self.start_x = event.x
@@ -107,6 +146,20 @@ class RegionSelector:
         
         region = (x1, y1, x2-x1, y2-y1)  # (x, y, width, height)
         
+        if self.multi_mode:
+            # 多区域模式下继续添加，直到回车确认
+            if self.rect_id:
+                self.canvas.delete(self.rect_id)
+                self.rect_id = None
+            if region[2] > 10 and region[3] > 10:
+                names = {item['name'] for item in self.regions}
+                index = len(self.regions) + 1
+                while f"区域{index}" in names:
+                    index += 1
+                self.regions.append({'name': f"区域{index}", 'region': list(region)})
+                self.draw_regions()
+            return
+        
         self.selector_window.destroy()
         
         if self.callback:
@@ -173,11 +226,42 @@ class EnhancedAIGameAssistant:
         self.monitoring = False
         self.selected_region = None  # 选定的识别区域
         self.full_screen_mode = True  # 是否全屏识别
+        self.multi_region_mode = False  # 是否多区域识别
+        self.named_regions = []  # 多区域识别的命名区域 [{'name': ..., 'region': [x, y, w, h]}]
+        
+        # 核心引擎（截图、编码、API调用、监控），界面只负责展示
+        self.engine = AssistantEngine(self.config)
+        self.engine.on_frame = lambda changed: self.root.after(0, self.update_scene_stats)
+        self.engine.on_error = self.on_monitor_error
+        self.engine.stream_factory = lambda: self.create_result_stream("🤖 AI建议:", footer=f"\n{'-'*50}")
+        
+        # 实时区域预览窗口
+        self.live_preview = LivePreview(self.root, self.engine, self.config.get('preview'),
+                                        describe=self.describe_preview)
         
         self.setup_ui()
         
         # 加载保存的设置
         self.load_settings()
+        
+        # 界面设置变化时同步到引擎
+        for var in (self.api_key_var, self.base_url_var, self.model_var, self.game_prompt_var,
+                    self.stream_var, self.encode_profile_var, self.delta_upload_var):
+            var.trace_add('write', self.sync_engine_settings)
+        self.sync_engine_settings()
+        self.sync_capture_region()
+        for var in (self.trigger_mode_var, self.trigger_profile_var):
+            var.trace_add('write', self.sync_trigger_settings)
+        self.sync_trigger_settings()
+        
+        # 窗口显示后再启动截图服务、预热连接并在后台加载cv2等较慢的模块
+        self.warmed_up = threading.Event()
+        self.root.after(100, self.warm_up)
+    
+    def warm_up(self):
+        """启动截图服务并预热到服务商的连接，在后台预加载较慢的模块"""
+        self.engine.start()
+        lazy_import.warm_up(on_done=self.warmed_up.set)
     
     def setup_window(self):
         """设置窗口"""
@@ -265,7 +349,16 @@ class EnhancedAIGameAssistant:
             value="region",
             command=self.update_region_mode
         )
-        region_radio.pack(side='left')
+        region_radio.pack(side='left', padx=(0, 20))
+        
+        multi_radio = ttk.Radiobutton(
+            mode_frame,
+            text="多区域识别",
+            variable=self.region_mode_var,
+            value="multi",
+            command=self.update_region_mode
+        )
+        multi_radio.pack(side='left')
         
         # 区域选择按钮
         region_btn_frame = ttk.Frame(region_frame)
@@ -322,7 +415,35 @@ class EnhancedAIGameAssistant:
             values=['gpt-4o', 'gpt-4o-mini', 'gpt-4-vision-preview', 'gpt-4-turbo'],
             width=47
         )
-        model_combo.pack(fill='x', pady=(2, 10))
+        model_combo.pack(fill='x', pady=(2, 5))
+        
+        # 流式输出
+        self.stream_var = tk.BooleanVar(value=self.config.get('stream', True))
+        ttk.Checkbutton(
+            api_frame,
+            text="流式输出（边生成边显示）",
+            variable=self.stream_var
+        ).pack(anchor='w', pady=(0, 5))
+        
+        # 图像编码配置
+        ttk.Label(api_frame, text="图像编码:").pack(anchor='w')
+        self.encode_profile_var = tk.StringVar(value=self.engine.image_encoder.profile)
+        encode_combo = ttk.Combobox(
+            api_frame,
+            textvariable=self.encode_profile_var,
+            values=list(self.engine.image_encoder.profiles),
+            state='readonly',
+            width=47
+        )
+        encode_combo.pack(fill='x', pady=(2, 5))
+        
+        # 局部上传
+        self.delta_upload_var = tk.BooleanVar(value=self.config.get('delta_upload', False))
+        ttk.Checkbutton(
+            api_frame,
+            text="只上传变化区域（附整体缩略图，节省流量）",
+            variable=self.delta_upload_var
+        ).pack(anchor='w', pady=(0, 10))
         
         save_config_btn = ttk.Button(api_frame, text="保存配置", command=self.save_config)
         save_config_btn.pack(anchor='w')
@@ -345,6 +466,82 @@ class EnhancedAIGameAssistant:
         
         game_prompt_text.bind('<KeyRelease>', update_prompt)
         
+        # ===================
+        # 画面变化检测设置
+        # ===================
+        change_frame = ttk.LabelFrame(main_frame, text="画面变化检测", padding="10")
+        change_frame.pack(fill='x', pady=(0, 10))
+        
+        threshold_frame = ttk.Frame(change_frame)
+        threshold_frame.pack(fill='x', pady=(0, 5))
+        
+        ttk.Label(threshold_frame, text="变化阈值:").pack(side='left')
+        
+        self.change_threshold_var = tk.DoubleVar(value=self.engine.scene_detector.threshold)
+        threshold_scale = ttk.Scale(
+            threshold_frame,
+            from_=0.0,
+            to=50.0,
+            variable=self.change_threshold_var,
+            orient='horizontal',
+            command=self.update_change_threshold
+        )
+        threshold_scale.pack(side='left', fill='x', expand=True, padx=(5, 5))
+        
+        self.change_threshold_label = ttk.Label(threshold_frame, text=f"{self.engine.scene_detector.threshold:.1f}")
+        self.change_threshold_label.pack(side='right')
+        
+        mask_btn_frame = ttk.Frame(change_frame)
+        mask_btn_frame.pack(fill='x')
+        
+        ttk.Button(
+            mask_btn_frame,
+            text="🚫 添加忽略区域",
+            command=self.start_mask_selection
+        ).pack(side='left', padx=(0, 10))
+        
+        ttk.Button(
+            mask_btn_frame,
+            text="清除忽略区域",
+            command=self.clear_ignore_masks
+        ).pack(side='left')
+        
+        self.mask_info_label = ttk.Label(
+            mask_btn_frame,
+            text=f"忽略区域: {len(self.engine.scene_detector.ignore_masks)}个"
+        )
+        self.mask_info_label.pack(side='right')
+        
+        # ===================
+        # 事件触发设置
+        # ===================
+        trigger_frame = ttk.LabelFrame(main_frame, text="事件触发", padding="10")
+        trigger_frame.pack(fill='x', pady=(0, 10))
+        
+        self.trigger_mode_var = tk.BooleanVar(value=self.config.get('trigger_mode', False))
+        ttk.Checkbutton(
+            trigger_frame,
+            text="只在画面出现模板时分析（Boss血条、死亡画面、商店等）",
+            variable=self.trigger_mode_var
+        ).pack(anchor='w')
+        
+        profile_frame = ttk.Frame(trigger_frame)
+        profile_frame.pack(fill='x', pady=(5, 0))
+        ttk.Label(profile_frame, text="游戏配置:").pack(side='left')
+        self.trigger_profile_var = tk.StringVar(value=self.engine.settings['trigger_profile'])
+        ttk.Combobox(
+            profile_frame,
+            textvariable=self.trigger_profile_var,
+            values=list(self.engine.settings['trigger_profiles']),
+            state='readonly',
+            width=20
+        ).pack(side='left', padx=(5, 10))
+        self.trigger_info_label = ttk.Label(
+            profile_frame,
+            text=f"触发器: {len(self.engine.trigger_engine.triggers)}个"
+        )
+        self.trigger_info_label.pack(side='right')
+        
         # ===================
         # 控制按钮
         # ===================
@@ -391,6 +588,9 @@ class EnhancedAIGameAssistant:
         self.result_text.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
         
+        # 限制条数并合并更新，长时间监控后控件也不会变慢
+        self.result_log = ResultLog(self.root, self.result_text, self.config.get('result_log'))
+        
         # 清除按钮
         clear_btn = ttk.Button(result_frame, text="清除记录", command=self.clear_results)
         clear_btn.pack(anchor='e', pady=(5, 0))
@@ -426,17 +626,89 @@ class EnhancedAIGameAssistant:
         
         if mode == "fullscreen":
             self.full_screen_mode = True
+            self.multi_region_mode = False
             self.selected_region = None
+            self.sync_capture_region()
             self.select_region_btn.config(state='disabled')
             self.preview_region_btn.config(state='disabled')
             self.region_info_label.config(text="当前：全屏识别")
         else:
             self.full_screen_mode = False
+            self.multi_region_mode = mode == "multi"
+            self.sync_capture_region()
             self.select_region_btn.config(state='normal')
-            if self.selected_region:
+            if self.engine.has_capture_region():
                 self.preview_region_btn.config(state='normal')
+            else:
+                self.preview_region_btn.config(state='disabled')
             self.update_region_info()
     
+    def sync_capture_region(self):
+        """将识别区域同步到引擎"""
+        self.engine.update_settings(
+            region_mode=self.region_mode_var.get(),
+            selected_region=self.selected_region,
+            named_regions=self.named_regions
+        )
+    
+    def sync_engine_settings(self, *args):
+        """将界面上的API和提示词设置同步到引擎"""
+        self.engine.update_settings(
+            api_key=self.api_key_var.get(),
+            base_url=self.base_url_var.get(),
+            model=self.model_var.get(),
+            game_prompt=self.game_prompt_var.get(),
+            stream=self.stream_var.get(),
+            encode_profile=self.encode_profile_var.get(),
+            delta_upload=self.delta_upload_var.get()
+        )
+    
+    def sync_trigger_settings(self, *args):
+        """将事件触发设置同步到引擎"""
+        self.engine.update_settings(
+            trigger_mode=self.trigger_mode_var.get(),
+            trigger_profile=self.trigger_profile_var.get()
+        )
+        self.trigger_info_label.config(text=f"触发器: {len(self.engine.trigger_engine.triggers)}个")
+    
+    def update_change_threshold(self, value):
+        """更新画面变化阈值"""
+        threshold = float(value)
+        self.engine.update_settings(change_threshold=threshold)
+        self.change_threshold_label.config(text=f"{threshold:.1f}")
+    
+    def start_mask_selection(self):
+        """选择忽略区域（时钟、FPS、小地图等）"""
+        self.update_status("请在屏幕上拖拽选择需要忽略的区域...")
+        self.root.withdraw()
+        
+        def on_mask_selected(region):
+            self.root.deiconify()
+            
+            if region and region[2] > 0 and region[3] > 0:
+                # 转换为相对于识别区域的坐标
+                x, y, w, h = region
+                bounds = self.engine.get_capture_bounds() if self.engine.has_capture_region() else None
+                if bounds:
+                    x -= bounds[0]
+                    y -= bounds[1]
+                
+                masks = list(self.engine.scene_detector.ignore_masks)
+                masks.append((x, y, w, h))
+                self.engine.update_settings(ignore_masks=masks)
+                self.mask_info_label.config(text=f"忽略区域: {len(masks)}个")
+                self.update_status("忽略区域已添加")
+            else:
+                self.update_status("忽略区域选择已取消")
+        
+        self.root.after(100, lambda: self.region_selector.select_region(on_mask_selected))
+    
+    def clear_ignore_masks(self):
+        """清除所有忽略区域"""
+        self.engine.update_settings(ignore_masks=[])
+        self.mask_info_label.config(text="忽略区域: 0个")
+        self.update_status("忽略区域已清除")
+    
     def start_region_selection(self):
         """开始区域选择"""
         self.update_status("请在屏幕上拖拽选择识别区域...")
@@ -461,84 +733,80 @@ class EnhancedAIGameAssistant:
                 self.selected_region = region
                 self.preview_region_btn.config(state='normal')
                 self.update_region_info()
+                self.sync_capture_region()
                 self.update_status("区域选择完成")
             else:
                 self.update_status("区域选择已取消或区域过小")
         
+        def on_regions_selected(regions):
+            self.root.deiconify()
+            
+            if was_topmost:
+                self.window_controller.set_window_topmost(self.root, True)
+            
+            if regions is None:
+                self.update_status("区域编辑已取消")
+                return
+            
+            # 为新添加的区域命名
+            old_names = {item['name'] for item in self.named_regions}
+            for item in regions:
+                if item['name'] not in old_names:
+                    name = simpledialog.askstring("区域名称", "请输入区域名称（如血条、小地图）:",
+                                                  initialvalue=item['name'], parent=self.root)
+                    if name and name.strip():
+                        item['name'] = name.strip()
+            
+            self.named_regions = regions
+            self.preview_region_btn.config(state='normal' if regions else 'disabled')
+            self.update_region_info()
+            self.sync_capture_region()
+            self.update_status(f"已设置 {len(regions)} 个识别区域")
+        
         # 延迟启动选择器，确保窗口隐藏完成
-        self.root.after(100, lambda: self.region_selector.select_region(on_region_selected))
+        if self.multi_region_mode:
+            self.root.after(100, lambda: self.region_selector.select_regions(on_regions_selected, self.named_regions))
+        else:
+            self.root.after(100, lambda: self.region_selector.select_region(on_region_selected))
     
     def preview_selected_region(self):
-        """预览选中的区域"""
-        if not self.selected_region:
+        """实时预览选中的区域"""
+        if not self.engine.has_capture_region():
             messagebox.showwarning("警告", "尚未选择区域")
             return
         
         try:
-            # 截取选定区域
-            screenshot = self.capture_region(self.selected_region)
-            
-            # 创建预览窗口
-            preview_window = tk.Toplevel(self.root)
-            preview_window.title("区域预览")
-            preview_window.attributes('-topmost', True)
-            
-            # 调整图片大小以适应显示
-            img = screenshot.copy()
-            max_size = 600
-            if img.width > max_size or img.height > max_size:
-                img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            
-            # 显示图片
-            photo = ImageTk.PhotoImage(img)
-            label = ttk.Label(preview_window, image=photo)
-            label.image = photo  # 保持引用
-            label.pack(padx=10, pady=10)
-            
-            # 信息标签
-            info_text = f"区域: {self.selected_region[0]},{self.selected_region[1]} - {self.selected_region[0]+self.selected_region[2]},{self.selected_region[1]+self.selected_region[3]}"
-            info_text += f"\n大小: {self.selected_region[2]}x{self.selected_region[3]}"
-            info_label = ttk.Label(preview_window, text=info_text)
-            info_label.pack(pady=(0, 10))
-            
-            # 关闭按钮
-            ttk.Button(preview_window, text="关闭", command=preview_window.destroy).pack(pady=(0, 10))
-            
+            self.live_preview.open()
         except Exception as e:
             messagebox.showerror("错误", f"预览失败: {e}")
     
+    def describe_preview(self, screenshot):
+        """预览窗口中的区域说明"""
+        if self.multi_region_mode:
+            info_text = "区域: " + ", ".join(item['name'] for item in self.named_regions)
+            info_text += f"\n拼接后大小: {screenshot.width}x{screenshot.height}"
+        elif self.selected_region:
+            info_text = f"区域: {self.selected_region[0]},{self.selected_region[1]} - {self.selected_region[0]+self.selected_region[2]},{self.selected_region[1]+self.selected_region[3]}"
+            info_text += f"\n大小: {self.selected_region[2]}x{self.selected_region[3]}"
+        else:
+            info_text = f"全屏: {screenshot.width}x{screenshot.height}"
+        return info_text
+    
     def update_region_info(self):
         """更新区域信息显示"""
-        if self.selected_region:
+        if self.multi_region_mode:
+            if self.named_regions:
+                names = ", ".join(item['name'] for item in self.named_regions)
+                self.region_info_label.config(text=f"当前：多区域识别 ({len(self.named_regions)}个: {names})")
+            else:
+                self.region_info_label.config(text="当前：多区域识别 (未设置区域)")
+        elif self.selected_region:
             x, y, w, h = self.selected_region
             info_text = f"当前：区域识别 ({x},{y}) 大小 {w}x{h}"
             self.region_info_label.config(text=info_text)
         else:
             self.region_info_label.config(text="当前：区域识别 (未选择区域)")
     
-    def capture_region(self, region=None):
-        """截取指定区域的屏幕"""
-        try:
-            with mss.mss() as sct:
-                if region:
-                    # 截取指定区域
-                    monitor = {
-                        "top": region[1],
-                        "left": region[0], 
-                        "width": region[2],
-                        "height": region[3]
-                    }
-                else:
-                    # 截取全屏
-                    monitor = sct.monitors[1]  # 主显示器
-                
-                screenshot = sct.grab(monitor)
-                img = Image.frombytes("RGB", screenshot.size, screenshot.bgra, "raw", "BGRX")
-                return img
-        except Exception as e:
-            print(f"截屏失败: {e}")
-            return None
-    
     def manual_recognition(self):
         """手动识别"""
         if not self.validate_config():
@@ -549,19 +817,18 @@ class EnhancedAIGameAssistant:
         # 在新线程中执行识别
         def recognize():
             try:
-                # 根据模式截取屏幕
-                if self.full_screen_mode:
-                    screenshot = self.capture_region()
-                else:
-                    if not self.selected_region:
-                        self.root.after(0, lambda: messagebox.showwarning("警告", "请先选择识别区域"))
-                        return
-                    screenshot = self.capture_region(self.selected_region)
+                # 根据模式读取最新画面
+                if not self.engine.has_capture_region():
+                    self.root.after(0, lambda: messagebox.showwarning("警告", "请先选择识别区域"))
+                    return
+                screenshot = self.engine.latest_frame()
                 
                 if screenshot:
-                    result = self.analyze_image(screenshot)
-                    self.root.after(0, lambda: self.display_result(f"手动识别结果:\n{result}"))
-                    self.root.after(0, lambda: self.update_status("手动识别完成"))
+                    stream = self.create_result_stream("手动识别结果:")
+                    result = self.engine.analyze(screenshot, on_token=stream.write)
+                    stream.finish(result['text'])
+                    hit_rate = self.engine.response_cache.get_stats()['hit_rate']
+                    self.root.after(0, lambda: self.update_status(f"手动识别完成 (缓存命中率 {hit_rate:.0%})"))
                 else:
                     self.root.after(0, lambda: self.update_status("截图失败"))
                     
@@ -584,16 +851,26 @@ class EnhancedAIGameAssistant:
     
     def save_config(self):
         """保存配置"""
-        config = {
+        config = dict(self.config)
+        config.update({
             'api_key': self.api_key_var.get(),
             'base_url': self.base_url_var.get(),
             'model': self.model_var.get(),
+            'encode_profile': self.encode_profile_var.get(),
+            'stream': self.stream_var.get(),
+            'delta_upload': self.delta_upload_var.get(),
+            'trigger_mode': self.trigger_mode_var.get(),
+            'trigger_profile': self.trigger_profile_var.get(),
+            'preview': self.live_preview.settings,
             'game_prompt': self.game_prompt_var.get(),
             'topmost': self.topmost_var.get(),
             'alpha': self.alpha_var.get(),
             'region_mode': self.region_mode_var.get(),
-            'selected_region': self.selected_region
-        }
+            'selected_region': self.selected_region,
+            'named_regions': self.named_regions,
+            'change_threshold': self.engine.settings['change_threshold'],
+            'ignore_masks': [list(mask) for mask in self.engine.scene_detector.ignore_masks]
+        })
         
         try:
             with open('config.json', 'w', encoding='utf-8') as f:
@@ -614,13 +891,16 @@ class EnhancedAIGameAssistant:
             self.alpha_var.set(self.config['alpha'])
             self.update_alpha(self.config['alpha'])
         
+        if self.config.get('named_regions'):
+            self.named_regions = self.config['named_regions']
+        
         if 'region_mode' in self.config:
             self.region_mode_var.set(self.config['region_mode'])
             self.update_region_mode()
         
         if 'selected_region' in self.config and self.config['selected_region']:
             self.selected_region = self.config['selected_region']
-            if not self.full_screen_mode:
+            if not self.full_screen_mode and not self.multi_region_mode:
                 self.preview_region_btn.config(state='normal')
                 self.update_region_info()
     
@@ -631,59 +911,6 @@ class EnhancedAIGameAssistant:
             return False
         return True
     
-    def analyze_image(self, image):
-        """分析图像"""
-        try:
-            # 转换图像为base64
-            from io import BytesIO
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            
-            # 准备API请求
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key_var.get()}"
-            }
-            
-            data = {
-                "model": self.model_var.get(),
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": self.game_prompt_var.get()
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{image_base64}"
-                                }
-                            }
-                        ]
-                    }
-                ],
-                "max_tokens": 500
-            }
-            
-            # 发送请求
-            response = requests.post(
-                f"{self.base_url_var.get()}/chat/completions",
-                headers=headers,
-                json=data
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content']
-            else:
-                return f"API请求失败: {response.status_code} - {response.text}"
-                
-        except Exception as e:
-            return f"分析失败: {e}"
-    
     def test_api(self):
         """测试API连接"""
         if not self.validate_config():
@@ -692,27 +919,16 @@ class EnhancedAIGameAssistant:
         self.update_status("正在测试API连接...")
         
         def test():
-            try:
-                headers = {
-                    "Authorization": f"Bearer {self.api_key_var.get()}"
-                }
-                
-                response = requests.get(
-                    f"{self.base_url_var.get()}/models",
-                    headers=headers,
-                    timeout=10
-                )
-                
-                if response.status_code == 200:
-                    self.root.after(0, lambda: self.update_status("API连接成功"))
-                    self.root.after(0, lambda: self.display_result("✅ API测试成功，连接正常"))
-                else:
-                    self.root.after(0, lambda: self.update_status("API连接失败"))
-                    self.root.after(0, lambda: self.display_result(f"❌ API测试失败: {response.status_code}"))
-                    
-            except Exception as e:
+            ok, status = self.engine.test_connection()
+            if ok:
+                self.root.after(0, lambda: self.update_status("API连接成功"))
+                self.root.after(0, lambda: self.display_result("✅ API测试成功，连接正常"))
+            elif isinstance(status, int):
+                self.root.after(0, lambda: self.update_status("API连接失败"))
+                self.root.after(0, lambda: self.display_result(f"❌ API测试失败: {status}"))
+            else:
                 self.root.after(0, lambda: self.update_status("API测试失败"))
-                self.root.after(0, lambda: self.display_result(f"❌ API测试出错: {e}"))
+                self.root.after(0, lambda: self.display_result(f"❌ API测试出错: {status}"))
         
         threading.Thread(target=test, daemon=True).start()
     
@@ -727,55 +943,85 @@ class EnhancedAIGameAssistant:
     
     def start_monitoring(self):
         """开始监控"""
+        if not self.engine.has_capture_region():
+            self.display_result("⚠️ 请先选择识别区域")
+            return
+        
         self.monitoring = True
         self.start_btn.config(text="⏹️ 停止监控")
         self.update_status("开始监控游戏画面...")
         
-        def monitor():
-            while self.monitoring:
-                try:
-                    # 根据模式截取屏幕
-                    if self.full_screen_mode:
-                        screenshot = self.capture_region()
-                    else:
-                        if not self.selected_region:
-                            self.root.after(0, lambda: self.display_result("⚠️ 请先选择识别区域"))
-                            break
-                        screenshot = self.capture_region(self.selected_region)
-                    
-                    if screenshot:
-                        result = self.analyze_image(screenshot)
-                        self.root.after(0, lambda r=result: self.display_result(f"🤖 AI建议:\n{r}\n{'-'*50}"))
-                    
-                    # 等待5秒或直到停止监控
-                    for _ in range(50):
-                        if not self.monitoring:
-                            break
-                        time.sleep(0.1)
-                        
-                except Exception as e:
-                    self.root.after(0, lambda e=e: self.display_result(f"监控出错: {e}"))
-                    break
-            
-            # 监控结束
-            self.root.after(0, self.stop_monitoring)
-        
-        threading.Thread(target=monitor, daemon=True).start()
+        self.engine.start_monitor()
+    
+    def on_monitor_error(self, error):
+        """流水线出错时停止监控"""
+        self.root.after(0, lambda: self.display_result(f"监控出错: {error}"))
+        self.root.after(0, self.stop_monitoring)
+    
+    def update_scene_stats(self):
+        """在状态栏显示画面统计"""
+        engine_stats = self.engine.get_stats()
+        stats = engine_stats['scene']
+        capture_stats = engine_stats['capture']
+        cache_stats = engine_stats['cache']
+        pipeline_stats = engine_stats['pipeline']
+        self.update_status(
+            f"监控中 - 截图 {stats['captured']} / 跳过 {stats['skipped']} / 发送 {stats['sent']}"
+            f" (变化 {stats['last_score']:.1f}) | 截图 {capture_stats['fps']:.1f}fps"
+            f" {capture_stats['avg_latency_ms']:.0f}ms | 缓存命中 {cache_stats['hit_rate']:.0%}"
+            f" | 请求中 {pipeline_stats['inflight']} 丢弃 {pipeline_stats['dropped']}"
+            f" | 间隔 {engine_stats['interval']:.1f}s"
+            + ("" if engine_stats['provider_available'] else " | 服务熔断中，已暂停")
+            + self.format_backend_stats(engine_stats['backends'])
+            + self.format_trim_stats(engine_stats['trim'])
+            + self.format_delta_stats(engine_stats['delta'])
+            + self.format_trigger_stats(engine_stats['triggers'])
+        )
+    
+    def format_trigger_stats(self, stats):
+        """触发模式下显示扫描耗时和触发次数"""
+        if not self.trigger_mode_var.get():
+            return ""
+        fires = sum(item['fires'] for item in stats['triggers'].values())
+        return f" | 触发扫描 {stats['avg_scan_ms']:.1f}ms 已触发 {fires}次"
+    
+    def format_delta_stats(self, stats):
+        """局部上传时显示局部请求比例和平均上传大小"""
+        if not stats['enabled']:
+            return ""
+        return f" | 局部上传 {stats['delta_rate']:.0%} 平均 {stats['avg_upload_kb']:.0f}KB"
+    
+    def format_trim_stats(self, stats):
+        """裁掉边框时显示每帧节省的大小"""
+        if not stats['box']:
+            return ""
+        return f" | 裁边 每帧省 {stats['bytes_saved_per_frame'] / 1024:.0f}KB 共 {stats['bytes_saved'] / 1048576:.1f}MB"
+    
+    def format_backend_stats(self, stats):
+        """多个服务时显示各服务胜出率和对冲率"""
+        if len(stats['backends']) < 2:
+            return ""
+        wins = " ".join(f"{name} {item['win_rate']:.0%}" for name, item in stats['backends'].items())
+        return f" | 服务 {wins} 对冲 {stats['hedge_rate']:.0%}(胜 {stats['hedge_win_rate']:.0%})"
     
     def stop_monitoring(self):
         """停止监控"""
         self.monitoring = False
+        self.engine.stop_monitor()
         self.start_btn.config(text="🎮 开始监控")
         self.update_status("监控已停止")
     
+    def create_result_stream(self, title, footer=""):
+        """创建流式结果输出"""
+        return self.result_log.stream(title, footer)
+    
     def display_result(self, text):
         """显示结果"""
-        self.result_text.insert(tk.END, f"\n[{time.strftime('%H:%M:%S')}] {text}\n")
-        self.result_text.see(tk.END)
+        self.result_log.append(text)
     
     def clear_results(self):
         """清除结果"""
-        self.result_text.delete(1.0, tk.END)
+        self.result_log.clear()
         self.update_status("结果已清除")
     
     def update_status(self, text):
@@ -804,9 +1050,16 @@ def main():
     
     app = EnhancedAIGameAssistant(root)
     
+    if os.environ.get("STARTUP_PROBE"):
+        # 启动时间测试(startup_benchmark.py)：记录窗口显示和预加载完成的时间后退出
+        from startup_probe import install_probe
+        install_probe(root, app.warmed_up)
+    
     # 程序退出时保存配置
     def on_closing():
-        app.monitoring = False  # 停止监控
+        app.live_preview.close()  # 关闭实时预览
+        app.stop_monitoring()  # 停止监控
+        app.engine.close()  # 停止截图服务、关闭连接池并保存缓存
         app.save_config()  # 保存配置
         root.destroy()
     
@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# 默认指标设置，可在config.json的"metrics"中覆盖
+DEFAULT_METRICS_SETTINGS = {
+    "enabled": True,
+    "buckets": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30],  # 耗时直方图分桶(秒)
+    "http_port": 0,            # 大于0时在本地提供 /metrics 接口
+    "prometheus_file": "",     # 退出时写出的Prometheus文本文件
+    "trace": False,            # 是否记录Chrome追踪事件
+    "trace_file": "trace.json",  # 退出时写出的追踪文件
+    "trace_max_events": 20000,   # 最多保留的追踪事件数
+}
+
+PREFIX = "game_assistant"
+
+
+class Histogram:
+    """累积分桶的耗时直方图"""
+
+    def __init__(self, buckets):
+        self.buckets = sorted(float(b) for b in buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        """按分桶估算分位数(取所在桶的上界)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= target:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """识别链路的计数器、耗时直方图和追踪事件
+
+    span(stage) 记录一个阶段的耗时；开启trace时同时记录为Chrome追踪事件，
+    可在 chrome://tracing 或 Perfetto 中查看单次识别的各阶段。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_METRICS_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.events = deque(maxlen=int(self.settings["trace_max_events"]))
+        self._origin = time.perf_counter()
+        self._server = None
+
+    @property
+    def enabled(self):
+        return bool(self.settings["enabled"])
+
+    @property
+    def tracing(self):
+        return self.enabled and bool(self.settings["trace"])
+
+    def inc(self, name, value=1):
+        """计数器加一"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage, seconds):
+        """记录一个阶段的耗时"""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.settings["buckets"])
+            histogram.observe(seconds)
+
+    @contextmanager
+    def span(self, stage, **args):
+        """记录代码块的耗时"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.observe(stage, end - start)
+            if self.tracing:
+                self._trace_event(stage, start, end, args)
+
+    def _trace_event(self, name, start, end, args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6, 1),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def get_summary(self):
+        """各阶段的次数、平均和p95耗时(毫秒)"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "avg_ms": h.sum / h.count * 1000 if h.count else 0.0,
+                    "p95_ms": h.quantile(0.95) * 1000,
+                }
+                for stage, h in self.histograms.items()
+            }
+
+    def to_prometheus(self):
+        """导出为Prometheus文本格式"""
+        lines = []
+        with self._lock:
+            for name in sorted(self.counters):
+                metric = f"{PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {self.counters[name]}")
+
+            metric = f"{PREFIX}_stage_seconds"
+            lines.append(f"# HELP {metric} 识别链路各阶段耗时")
+            lines.append(f"# TYPE {metric} histogram")
+            for stage in sorted(self.histograms):
+                h = self.histograms[stage]
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound:g}"}} {count}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.sum:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """写出Prometheus文本文件（可配合node_exporter的textfile收集）"""
+        path = path or self.settings["prometheus_file"]
+        if not path:
+            return
+        try:
+            tmp = f"{path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"写出指标失败: {e}")
+
+    def export_trace(self, path=None):
+        """写出Chrome追踪事件JSON"""
+        path = path or self.settings["trace_file"]
+        if not path or not self.events:
+            return
+        with self._lock:
+            events = list(self.events)
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        except Exception as e:
+            print(f"导出追踪失败: {e}")
+
+    def serve(self, port=None, host="127.0.0.1"):
+        """在后台线程中提供 /metrics 接口"""
+        port = port if port is not None else int(self.settings["http_port"])
+        if not port or self._server:
+            return
+        # 只有开启指标接口时才需要http.server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split('?')[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        try:
+            self._server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            print(f"指标接口启动失败: {e}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        print(f"指标接口: http://{host}:{port}/metrics")
+
+    def close(self):
+        """停止指标接口并写出文件"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.write_prometheus()
+        if self.tracing:
+            self.export_trace()
+
+
+_shared_metrics = None
+_shared_lock = threading.Lock()
+
+
+def get_metrics(settings=None):
+    """获取进程内共享的指标"""
+    global _shared_metrics
+    with _shared_lock:
+        if _shared_metrics is None:
+            _shared_metrics = Metrics(settings)
+        return _shared_metrics
@@ -0,0 +1,224 @@
+"""本地模拟的OpenAI兼容接口，用于基准测试和离线调试
+
+提供 GET /models 和 POST /chat/completions（支持 stream=true 的SSE输出），
+可配置响应延迟、逐字输出间隔和错误注入。
+
+命令行用法:
+    python mock_server.py --port 8765 --latency 0.3 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 默认模拟设置
+DEFAULT_MOCK_SETTINGS = {
+    "latency": 0.2,          # 返回响应头前的延迟(秒)
+    "jitter": 0.0,           # 延迟的随机波动(秒)
+    "token_delay": 0.02,     # 流式输出时每段文本的间隔(秒)
+    "reply": "这是模拟的游戏建议：注意左侧的敌人，先补充血量再前进。",
+    "chunk_chars": 4,        # 流式输出时每段文本的字数
+    "error_rate": 0.0,       # 随机返回错误的概率
+    "error_status": 500,     # 注入错误时的状态码
+    "retry_after": None,     # 注入错误时附带的Retry-After(秒)
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和正文分开写出，关闭Nagle算法避免额外的ACK等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_error(self):
+        """按设置返回错误，返回是否已注入"""
+        status = self.mock.next_error()
+        if status is None:
+            return False
+        headers = {}
+        if self.mock.settings["retry_after"] is not None:
+            headers["Retry-After"] = str(self.mock.settings["retry_after"])
+        self._send_json(status, {"error": {"message": "injected error", "code": status}}, headers)
+        return True
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith("/models"):
+            self.mock.count("models")
+            if self._inject_error():
+                return
+            self._send_json(200, {"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if not self.path.rstrip('/').endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        self.mock.count("completions", len(body))
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        time.sleep(self.mock.delay())
+        if self._inject_error():
+            return
+
+        model = request.get("model", "mock-model")
+        if request.get("stream"):
+            self._stream(model)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.mock.settings["reply"]},
+                             "finish_reason": "stop"}],
+            })
+
+    def _stream(self, model):
+        """以SSE分块输出回复"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(data):
+            chunk = data.encode('utf-8')
+            self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+
+        reply = self.mock.settings["reply"]
+        size = max(1, int(self.mock.settings["chunk_chars"]))
+        try:
+            for i in range(0, len(reply), size):
+                event = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "model": model,
+                         "choices": [{"index": 0, "delta": {"content": reply[i:i + size]}}]}
+                write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                time.sleep(self.mock.settings["token_delay"])
+            write("data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端提前断开(如对冲请求被放弃)
+            self.close_connection = True
+
+
+class MockOpenAIServer:
+    """在后台线程中运行的模拟接口服务"""
+
+    def __init__(self, settings=None, host="127.0.0.1", port=0):
+        self.settings = dict(DEFAULT_MOCK_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+        self._lock = threading.Lock()
+        self._fail_next = []
+        self.requests = {"models": 0, "completions": 0, "bytes_received": 0}
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def update(self, **settings):
+        """修改模拟设置（对之后的请求生效）"""
+        with self._lock:
+            self.settings.update(settings)
+
+    def fail_next(self, count=1, status=None):
+        """让接下来的count个请求返回错误"""
+        with self._lock:
+            self._fail_next.extend([status or self.settings["error_status"]] * count)
+
+    def next_error(self):
+        """本次请求需要注入的错误状态码，不注入时返回None"""
+        with self._lock:
+            if self._fail_next:
+                return self._fail_next.pop(0)
+            if self.settings["error_rate"] and random.random() < self.settings["error_rate"]:
+                return self.settings["error_status"]
+        return None
+
+    def delay(self):
+        latency = self.settings["latency"] + random.uniform(-1, 1) * self.settings["jitter"]
+        return max(0.0, latency)
+
+    def count(self, endpoint, size=0):
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.requests["bytes_received"] += size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟OpenAI兼容接口")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=DEFAULT_MOCK_SETTINGS["latency"], help="响应延迟(秒)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="延迟波动(秒)")
+    parser.add_argument('--token-delay', type=float, default=DEFAULT_MOCK_SETTINGS["token_delay"], help="流式输出间隔(秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="随机错误概率")
+    parser.add_argument('--error-status', type=int, default=500, help="注入错误的状态码")
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer({
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "token_delay": args.token_delay,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+    }, host=args.host, port=args.port)
+    print(f"模拟接口已启动: {server.base_url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
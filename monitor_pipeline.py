@@ -0,0 +1,187 @@
+import threading
+from collections import deque
+
+
+# 默认流水线设置，可在config.json的"pipeline"中覆盖
+DEFAULT_PIPELINE_SETTINGS = {
+    "interval": 5.0,       # 截图间隔(秒)
+    "queue_size": 1,       # 各阶段之间的队列长度
+    "drop_oldest": True,   # 队列满时丢弃最旧的画面，否则等待(背压)
+    "max_inflight": 1,     # 同时进行中的API请求数上限
+}
+
+
+class StageQueue:
+    """阶段间的有界队列
+
+    drop_oldest=True 时队列满则丢弃最旧的元素，保证不会分析过期画面；
+    否则写入方阻塞等待，形成背压。
+    """
+
+    def __init__(self, maxsize=1, drop_oldest=True):
+        self.maxsize = max(1, int(maxsize))
+        self.drop_oldest = drop_oldest
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item, stop_event):
+        """放入元素，停止时返回False"""
+        with self._cond:
+            while len(self._items) >= self.maxsize:
+                if self.drop_oldest:
+                    self._items.popleft()
+                    self.dropped += 1
+                    break
+                if stop_event.is_set():
+                    return False
+                self._cond.wait(0.1)
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=0.1):
+        """取出元素，超时返回None"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+            self._cond.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class MonitorPipeline:
+    """监控流水线: 截图 → 编码 → 请求
+
+    各阶段运行在独立线程中并通过有界队列连接，第N+1帧的截图和编码
+    可以与第N帧的API请求同时进行。
+
+    capture() 返回需要分析的画面（无需分析时返回None），
+    encode(frame) 返回请求数据（无需请求时返回None），
+    request(payload) 执行请求并返回结果，交给 on_result(result)。
+    提供 scheduler 时截图间隔由 scheduler.next_interval() 决定；
+    paced_by_capture 为True时不额外等待，由 capture() 自行等待新画面。
+    """
+
+    def __init__(self, capture, encode, request, on_result=None, on_error=None, settings=None, scheduler=None):
+        self.settings = dict(DEFAULT_PIPELINE_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self.capture = capture
+        self.encode = encode
+        self.request = request
+        self.on_result = on_result
+        self.on_error = on_error
+        self.scheduler = scheduler
+
+        self.interval = float(self.settings["interval"])
+        self.paced_by_capture = False
+        self.max_inflight = max(1, int(self.settings["max_inflight"]))
+
+        self.frame_queue = StageQueue(self.settings["queue_size"], self.settings["drop_oldest"])
+        self.request_queue = StageQueue(self.settings["queue_size"], self.settings["drop_oldest"])
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        """启动各阶段线程"""
+        # 每次启动使用新的停止事件，避免上一轮未结束的请求线程被重新唤醒
+        self._stop = threading.Event()
+        self.frame_queue.clear()
+        self.request_queue.clear()
+
+        targets = [self._capture_loop, self._encode_loop]
+        targets += [self._request_loop] * self.max_inflight
+        self._threads = [threading.Thread(target=t, args=(self._stop,), daemon=True) for t in targets]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """停止流水线（不等待进行中的请求）"""
+        self._stop.set()
+        self._threads = []
+
+    def get_stats(self):
+        """获取队列和请求统计"""
+        return {
+            "frames_queued": len(self.frame_queue),
+            "requests_queued": len(self.request_queue),
+            "dropped": self.frame_queue.dropped + self.request_queue.dropped,
+            "inflight": self._inflight,
+        }
+
+    def next_interval(self):
+        """下一次截图前的等待时间"""
+        if self.paced_by_capture:
+            return 0.0
+        if self.scheduler:
+            return self.scheduler.next_interval()
+        return self.interval
+
+    def _fail(self, error, stop):
+        """阶段出错时停止流水线"""
+        if stop.is_set():
+            return
+        stop.set()
+        if self.on_error:
+            self.on_error(error)
+
+    def _capture_loop(self, stop):
+        while not stop.is_set():
+            try:
+                frame = self.capture()
+                if frame is not None:
+                    self.frame_queue.put(frame, stop)
+            except Exception as e:
+                self._fail(e, stop)
+                return
+            stop.wait(self.next_interval())
+
+    def _encode_loop(self, stop):
+        while not stop.is_set():
+            frame = self.frame_queue.get()
+            if frame is None:
+                continue
+            try:
+                payload = self.encode(frame)
+                if payload is not None:
+                    self.request_queue.put(payload, stop)
+            except Exception as e:
+                self._fail(e, stop)
+                return
+
+    def _request_loop(self, stop):
+        while not stop.is_set():
+            payload = self.request_queue.get()
+            if payload is None:
+                continue
+            with self._inflight_lock:
+                self._inflight += 1
+            try:
+                result = self.request(payload)
+                if self.on_result and not stop.is_set():
+                    self.on_result(result)
+            except Exception as e:
+                self._fail(e, stop)
+                return
+            finally:
+                with self._inflight_lock:
+                    self._inflight -= 1
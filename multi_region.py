@@ -0,0 +1,79 @@
+import functools
+
+from frame import to_pil
+
+from lazy_import import lazy_import
+
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFont = lazy_import("PIL.ImageFont")
+
+
+@functools.lru_cache(maxsize=None)
+def _label_font(size=14):
+    """标签字体，优先使用支持中文的系统字体（按字号缓存，避免每次拼接都重新加载）"""
+    for name in ("msyh.ttc", "simhei.ttf", "NotoSansCJK-Regular.ttc", "wqy-microhei.ttc"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def bounding_box(regions):
+    """所有区域的外接矩形 (x, y, w, h)"""
+    if not regions:
+        return None
+    x1 = min(r[0] for r in regions)
+    y1 = min(r[1] for r in regions)
+    x2 = max(r[0] + r[2] for r in regions)
+    y2 = max(r[1] + r[3] for r in regions)
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+def crop_regions(frame, named_regions, origin=(0, 0)):
+    """从一次截图中裁剪出各命名区域
+
+    frame 是外接矩形的截图，origin 为其左上角在屏幕上的坐标。
+    返回 [(名称, 图像), ...]
+    """
+    tiles = []
+    for item in named_regions:
+        x, y, w, h = item['region']
+        left = x - origin[0]
+        top = y - origin[1]
+        tiles.append((item['name'], frame.crop((left, top, left + w, top + h))))
+    return tiles
+
+
+def build_mosaic(tiles, max_width=1280, padding=4, label_height=18, background=(32, 32, 32)):
+    """将多个区域按行排列拼接成一张带标签的图片"""
+    if not tiles:
+        return None
+
+    # 按高度从高到低逐行摆放(shelf packing)
+    order = sorted(tiles, key=lambda t: t[1].height, reverse=True)
+    max_width = max(max_width, max(img.width for _, img in order) + padding * 2)
+
+    placements = []
+    x = y = padding
+    row_height = 0
+    for name, img in order:
+        if x + img.width + padding > max_width and x > padding:
+            x = padding
+            y += row_height + padding
+            row_height = 0
+        placements.append((name, img, x, y))
+        x += img.width + padding
+        row_height = max(row_height, img.height + label_height)
+
+    width = max(px + img.width for _, img, px, _ in placements) + padding
+    height = y + row_height + padding
+
+    mosaic = Image.new("RGB", (width, height), background)
+    draw = ImageDraw.Draw(mosaic)
+    font = _label_font(max(10, label_height - 4))
+    for name, img, px, py in placements:
+        draw.text((px + 2, py + 1), name, fill=(255, 255, 0), font=font)
+        mosaic.paste(to_pil(img), (px, py + label_height))
+    return mosaic
@@ -0,0 +1,186 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+
+# 默认限流设置，可在config.json的"rate_limit"中覆盖
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    "rpm": 30,                 # 每分钟请求数上限(0表示不限)
+    "tpm": 60000,              # 每分钟token数上限(0表示不限)
+    "limits": {},              # 按 "服务商" 或 "服务商/模型" 覆盖，如 {"openrouter.ai/openai/gpt-4o": {"rpm": 10}}
+    "max_wait": 60.0,          # 等待令牌的最长时间(秒)
+    "max_retries": 3,          # 临时错误的重试次数
+    "backoff_base": 1.0,       # 指数退避的初始间隔(秒)
+    "backoff_max": 30.0,       # 退避间隔上限(秒)
+    "retry_statuses": [408, 429, 500, 502, 503, 504],
+    "breaker_failures": 5,     # 连续失败多少次后熔断
+    "breaker_cooldown": 60.0,  # 熔断后暂停的时间(秒)
+}
+
+
+def parse_retry_after(value):
+    """解析Retry-After响应头(秒数或HTTP日期)，返回秒数"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶，按每分钟速率匀速补充"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """取出amount个令牌需要等待的秒数"""
+        self._refill(now)
+        # 超过容量的请求在桶满时放行，避免永远等待
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后在冷却期内拒绝请求，冷却后放行一次试探"""
+
+    def __init__(self, failures=5, cooldown=60.0):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()  # 多个请求并行时只放行一个试探
+
+    @property
+    def state(self):
+        if self.consecutive < self.failures:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def allow(self):
+        """是否允许发送请求"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release(self):
+        """试探请求没有得出结论(客户端错误、被放弃、限流超时等)时归还试探名额"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive += 1
+            self._probing = False
+            if self.consecutive >= self.failures:
+                self.open_until = time.monotonic() + self.cooldown
+
+    def remaining(self):
+        return max(0.0, self.open_until - time.monotonic())
+
+
+class RateLimiter:
+    """按服务商和模型限流，并按服务商熔断"""
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_RATE_LIMIT_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._lock = threading.Lock()
+        self._buckets = {}   # key -> (rpm桶, tpm桶)
+        self._blocked = {}   # key -> 在此时间前暂停(Retry-After)
+        self._breakers = {}  # provider -> CircuitBreaker
+
+    def _limits(self, provider, model):
+        limits = {"rpm": self.settings["rpm"], "tpm": self.settings["tpm"]}
+        overrides = self.settings["limits"]
+        limits.update(overrides.get(provider, {}))
+        limits.update(overrides.get(f"{provider}/{model}", {}))
+        return limits
+
+    def _get_buckets(self, provider, model):
+        key = f"{provider}/{model}"
+        if key not in self._buckets:
+            limits = self._limits(provider, model)
+            self._buckets[key] = (
+                TokenBucket(limits["rpm"]) if limits["rpm"] else None,
+                TokenBucket(limits["tpm"]) if limits["tpm"] else None,
+            )
+        return key, self._buckets[key]
+
+    def acquire(self, provider, model, tokens=0):
+        """等待直到可以发送请求，超过max_wait时返回False"""
+        deadline = time.monotonic() + self.settings["max_wait"]
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                key, (rpm, tpm) = self._get_buckets(provider, model)
+                wait = max(0.0, self._blocked.get(key, 0.0) - now)
+                if rpm:
+                    wait = max(wait, rpm.wait_time(1, now))
+                if tpm and tokens:
+                    wait = max(wait, tpm.wait_time(tokens, now))
+                if wait <= 0:
+                    if rpm:
+                        rpm.take(1)
+                    if tpm and tokens:
+                        tpm.take(tokens)
+                    return True
+            if now + wait > deadline:
+                return False
+            time.sleep(min(wait, 1.0))
+
+    def block(self, provider, model, seconds):
+        """服务商要求等待时(Retry-After)暂停该模型的请求"""
+        with self._lock:
+            key = f"{provider}/{model}"
+            self._blocked[key] = max(self._blocked.get(key, 0.0), time.monotonic() + seconds)
+
+    def breaker(self, provider):
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(
+                    int(self.settings["breaker_failures"]), float(self.settings["breaker_cooldown"]))
+            return self._breakers[provider]
+
+    def is_open(self, provider):
+        """服务商是否处于熔断状态"""
+        return self.breaker(provider).state == "open"
+
+    def backoff(self, attempt):
+        """带随机抖动的指数退避间隔"""
+        delay = min(self.settings["backoff_max"], self.settings["backoff_base"] * (2 ** attempt))
+        return random.uniform(delay / 2, delay)
+
+    def should_retry(self, status_code):
+        return status_code in self.settings["retry_statuses"]
@@ -0,0 +1,142 @@
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from frame import Frame, to_pil
+from image_encoder import ImageEncoder
+from lazy_import import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageTk = lazy_import("PIL.ImageTk")
+
+
+# 默认实时预览设置，可在config.json的"preview"中覆盖
+DEFAULT_PREVIEW_SETTINGS = {
+    "fps": 10.0,       # 预览刷新帧率
+    "max_size": 600,   # 预览图最长边
+}
+
+
+class LivePreview:
+    """实时区域预览窗口
+
+    从常驻截图服务读取最新画面，按设定帧率刷新，预览期间截图帧率
+    至少提高到预览帧率。缩放使用开销低的滤镜，始终复用同一个
+    PhotoImage；截图服务没有新画面或缩小后的画面没有变化时不重绘，
+    窗口最小化时不做任何处理。
+    """
+
+    def __init__(self, root, engine, settings=None, describe=None):
+        self.root = root
+        self.engine = engine
+        self.settings = dict(DEFAULT_PREVIEW_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+        self.describe = describe  # 返回区域说明文字的回调
+
+        self.window = None
+        self.photo = None
+        self._after_id = None
+        self._last_frame = None
+        self._last_pixels = None
+
+        # 统计
+        self._draw_times = []
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+
+    @property
+    def is_open(self):
+        return self.window is not None
+
+    def open(self):
+        """打开预览窗口，已打开时置于最前"""
+        if self.window is not None:
+            self.window.lift()
+            return
+        self.window = tk.Toplevel(self.root)
+        self.window.title("区域预览")
+        self.window.attributes('-topmost', True)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.image_label = ttk.Label(self.window)
+        self.image_label.pack(padx=10, pady=10)
+        self.info_label = ttk.Label(self.window, justify='left')
+        self.info_label.pack(padx=10, pady=(0, 5))
+
+        controls = ttk.Frame(self.window)
+        controls.pack(pady=(0, 10))
+        ttk.Label(controls, text="刷新帧率:").pack(side='left')
+        self.fps_var = tk.DoubleVar(value=self.settings["fps"])
+        tk.Spinbox(controls, from_=1, to=30, increment=1, width=4, textvariable=self.fps_var,
+                   command=self._on_fps_change).pack(side='left', padx=(5, 15))
+        ttk.Button(controls, text="关闭", command=self.close).pack(side='left')
+
+        self._last_frame = None
+        self._last_pixels = None
+        self.engine.set_preview_fps(self.settings["fps"])
+        self._tick()
+
+    def close(self):
+        """关闭预览窗口并恢复截图帧率"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self.window is not None:
+            self.window.destroy()
+            self.window = None
+        self.photo = None
+        self._last_frame = None
+        self._last_pixels = None
+        self.engine.set_preview_fps(0)
+
+    def _on_fps_change(self):
+        try:
+            fps = min(30.0, max(1.0, float(self.fps_var.get())))
+        except (tk.TclError, ValueError):
+            return
+        self.settings["fps"] = fps
+        self.engine.set_preview_fps(fps)
+
+    def _tick(self):
+        self._after_id = None
+        if self.window is None:
+            return
+        try:
+            if self.window.winfo_viewable():
+                self._refresh()
+        except Exception as e:
+            self.info_label.config(text=f"预览失败: {e}")
+        self._after_id = self.root.after(max(1, int(1000 / self.settings["fps"])), self._tick)
+
+    def _refresh(self):
+        """读取最新画面，有变化时更新预览图"""
+        frame = self.engine.capture_service.get_latest(timeout=0)
+        if frame is None or frame is self._last_frame:
+            return
+        self._last_frame = frame
+
+        image = self.engine.preview_image(frame)
+        size = ImageEncoder.fit_size(image.width, image.height, self.settings["max_size"])
+        small = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+        pixels = small.bgra if isinstance(small, Frame) else np.asarray(small)
+        if self._last_pixels is not None and np.array_equal(pixels, self._last_pixels):
+            # 画面没有变化，不重绘
+            self.frames_skipped += 1
+            return
+        self._last_pixels = pixels
+
+        small = to_pil(small)
+        if self.photo is None or (self.photo.width(), self.photo.height()) != small.size:
+            self.photo = ImageTk.PhotoImage(small)
+            self.image_label.config(image=self.photo)
+        else:
+            self.photo.paste(small)
+        self.frames_drawn += 1
+
+        now = time.monotonic()
+        self._draw_times = [t for t in self._draw_times if now - t < 2.0] + [now]
+        info = self.describe(image) if self.describe else f"大小: {image.width}x{image.height}"
+        self.info_label.config(text=f"{info}\n预览 {len(self._draw_times) / 2.0:.1f} 帧/秒，"
+                                    f"已重绘 {self.frames_drawn} 帧，跳过 {self.frames_skipped} 帧")
@@ -0,0 +1,160 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from frame import to_gray
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+# 默认缓存设置，可在config.json的"cache"中覆盖
+DEFAULT_CACHE_SETTINGS = {
+    "enabled": True,
+    "max_size": 256,       # 最多缓存条数 (LRU淘汰)
+    "ttl": 3600,           # 过期时间(秒)
+    "max_distance": 4,     # 感知哈希允许的汉明距离
+    "persist": True,       # 是否保存到磁盘
+    "file": "response_cache.json",  # 与config.json放在同一目录
+}
+
+
+def perceptual_hash(image, hash_size=8):
+    """计算画面的差值哈希(dHash)，返回64位整数"""
+    small = cv2.resize(to_gray(image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming_distance(a, b):
+    """两个哈希之间的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+class ResponseCache:
+    """AI回复缓存
+
+    以 (模型, 提示词, 画面感知哈希) 为键，哈希在汉明距离容差内即视为命中。
+    超过容量时按LRU淘汰，超过TTL的条目自动过期。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_CACHE_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._entries = OrderedDict()  # (model, prompt, hash) -> (response, timestamp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.settings["persist"]:
+            self.load()
+
+    @property
+    def enabled(self):
+        return bool(self.settings["enabled"])
+
+    def _expired(self, timestamp, now):
+        return now - timestamp > self.settings["ttl"]
+
+    def get(self, model, prompt, image_hash):
+        """查找缓存，未命中返回None"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            match = None
+            key = (model, prompt, image_hash)
+            if key in self._entries:
+                match = key
+            else:
+                max_distance = self.settings["max_distance"]
+                best = max_distance + 1
+                for entry_key in self._entries:
+                    if entry_key[0] != model or entry_key[1] != prompt:
+                        continue
+                    distance = hamming_distance(entry_key[2], image_hash)
+                    if distance < best:
+                        best = distance
+                        match = entry_key
+
+            if match is not None:
+                response, timestamp = self._entries[match]
+                if self._expired(timestamp, now):
+                    del self._entries[match]
+                else:
+                    self._entries.move_to_end(match)
+                    self.hits += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def put(self, model, prompt, image_hash, response):
+        """写入缓存"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            key = (model, prompt, image_hash)
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.settings["max_size"]:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        """获取命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._entries),
+        }
+
+    def load(self):
+        """从磁盘加载缓存"""
+        path = self.settings["file"]
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+            now = time.time()
+            with self._lock:
+                for model, prompt, image_hash, response, timestamp in items:
+                    if not self._expired(timestamp, now):
+                        self._entries[(model, prompt, int(image_hash))] = (response, timestamp)
+                while len(self._entries) > self.settings["max_size"]:
+                    self._entries.popitem(last=False)
+        except Exception as e:
+            print(f"加载回复缓存失败: {e}")
+
+    def save(self):
+        """保存缓存到磁盘"""
+        if not self.settings["persist"]:
+            return
+        now = time.time()
+        with self._lock:
+            items = [
+                [model, prompt, str(image_hash), response, timestamp]
+                for (model, prompt, image_hash), (response, timestamp) in self._entries.items()
+                if not self._expired(timestamp, now)
+            ]
+        try:
+            with open(self.settings["file"], 'w', encoding='utf-8') as f:
+                json.dump(items, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"保存回复缓存失败: {e}")
@@ -0,0 +1,133 @@
+import queue
+import threading
+import time
+import tkinter as tk
+
+from stream_view import TextStreamWriter
+
+
+# 默认结果记录设置，可在config.json的"result_log"中覆盖
+DEFAULT_RESULT_LOG_SETTINGS = {
+    "max_entries": 300,             # 结果区域最多保留的条数
+    "archive": True,                # 是否将移除的旧记录追加到文件
+    "archive_file": "result_log.txt",
+    "frame_ms": 33,                 # 合并更新的间隔(毫秒)
+}
+
+
+class ResultLog:
+    """有上限的结果记录
+
+    append() 可在任意线程调用，待写入的条目和流式输出在每个帧间隔内合并为
+    一次控件更新；超过上限时删除最旧的条目，并可在后台归档到文件。
+    """
+
+    def __init__(self, root, widget, settings=None):
+        self.root = root
+        self.widget = widget
+        self.settings = dict(DEFAULT_RESULT_LOG_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._lock = threading.Lock()
+        self._pending = []     # 待写入的文本，或流式记录的写入函数
+        self._scheduled = False
+        self._marks = []       # 每条记录起始位置的mark名，从旧到新
+        self._next_mark = 0
+        self.trimmed = 0
+
+        self._archive_queue = None
+        if self.settings["archive"]:
+            self._archive_queue = queue.Queue()
+            threading.Thread(target=self._archive_loop, daemon=True).start()
+
+    def append(self, text):
+        """追加一条记录（可在任意线程调用）"""
+        self._enqueue(f"\n[{time.strftime('%H:%M:%S')}] {text}\n")
+
+    def _enqueue(self, item):
+        with self._lock:
+            self._pending.append(item)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self.root.after(self.settings["frame_ms"], self._flush)
+
+    def stream(self, title, footer=""):
+        """创建流式输出的记录"""
+        return TextStreamWriter(
+            self.root,
+            self.widget,
+            header=f"\n[{time.strftime('%H:%M:%S')}] {title}\n",
+            footer=f"{footer}\n",
+            on_start=self._begin_entry,
+            schedule=self._enqueue  # 与其它记录一起按帧写入并裁剪
+        )
+
+    def _begin_entry(self):
+        """在Tk主线程中标记一条新记录的开始位置"""
+        name = f"entry{self._next_mark}"
+        self._next_mark += 1
+        self.widget.mark_set(name, 'end-1c')
+        self.widget.mark_gravity(name, 'left')
+        self._marks.append(name)
+
+    def _flush(self):
+        """在Tk主线程中一次写入所有待显示的记录"""
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._scheduled = False
+        if not pending:
+            return
+
+        for item in pending:
+            if callable(item):
+                item()  # 流式记录的新内容
+                continue
+            self._begin_entry()
+            self.widget.insert(tk.END, item)
+        self.trim()
+        self.widget.see(tk.END)
+
+    def trim(self):
+        """删除超出上限的最旧记录"""
+        excess = len(self._marks) - int(self.settings["max_entries"])
+        if excess <= 0:
+            return
+        keep = self._marks[excess]
+        removed = self._marks[:excess]
+        self._marks = self._marks[excess:]
+
+        if self._archive_queue:
+            self._archive_queue.put(self.widget.get('1.0', keep))
+        self.widget.delete('1.0', keep)
+        for name in removed:
+            self.widget.mark_unset(name)
+        self.trimmed += excess
+
+    def clear(self):
+        """清除所有记录"""
+        with self._lock:
+            # 保留流式记录的写入函数，否则其后的输出不会再被调度
+            self._pending = [item for item in self._pending if callable(item)]
+        if self._archive_queue:
+            self._archive_queue.put(self.widget.get('1.0', 'end-1c'))
+        self.widget.delete('1.0', tk.END)
+        for name in self._marks:
+            self.widget.mark_unset(name)
+        self._marks = []
+
+    def _archive_loop(self):
+        while True:
+            text = self._archive_queue.get()
+            # 合并积压的归档内容后一次写入
+            while not self._archive_queue.empty():
+                text += self._archive_queue.get()
+            if not text.strip():
+                continue
+            try:
+                with open(self.settings["archive_file"], 'a', encoding='utf-8') as f:
+                    f.write(text)
+            except Exception as e:
+                print(f"归档结果记录失败: {e}")
@@ -0,0 +1,103 @@
+from frame import gray_thumbnail
+
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+
+class SceneChangeDetector:
+    """画面变化检测器
+
+    将画面缩小为灰度图后按块计算与上一次发送画面的平均绝对差(MAD)，
+    只有最大块差异超过阈值时才认为画面发生了变化。
+    """
+
+    def __init__(self, threshold=8.0, block_size=8, sample_width=160, ignore_masks=None):
+        self.threshold = float(threshold)  # 块平均差异阈值 (0-255)
+        self.block_size = int(block_size)  # 缩略图上的块大小(像素)
+        self.sample_width = int(sample_width)  # 缩略图宽度
+        self.ignore_masks = list(ignore_masks or [])  # [(x, y, w, h), ...] 相对于截图的坐标
+
+        self.reference = None  # 上一次发送的缩略图
+        self.last_score = 0.0
+
+        # 统计计数
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.frames_sent = 0
+
+    def set_threshold(self, threshold):
+        """设置变化阈值"""
+        self.threshold = float(threshold)
+
+    def set_ignore_masks(self, masks):
+        """设置忽略区域（时钟、FPS、小地图等）"""
+        self.ignore_masks = [tuple(int(v) for v in mask) for mask in (masks or [])]
+        # 忽略区域变化后需要重新建立参考帧
+        self.reference = None
+
+    def reset(self):
+        """重置参考帧和统计"""
+        self.reference = None
+        self.last_score = 0.0
+        self.frames_captured = 0
+        self.frames_skipped = 0
+        self.frames_sent = 0
+
+    def _prepare(self, image):
+        """转换为缩小后的灰度图，并将忽略区域置零"""
+        small = gray_thumbnail(image, self.sample_width)
+        small_h, small_w = small.shape
+        scale = min(1.0, self.sample_width / float(image.width))
+
+        for x, y, w, h in self.ignore_masks:
+            x1 = max(0, int(x * scale))
+            y1 = max(0, int(y * scale))
+            x2 = min(small_w, int(np.ceil((x + w) * scale)))
+            y2 = min(small_h, int(np.ceil((y + h) * scale)))
+            if x2 > x1 and y2 > y1:
+                small[y1:y2, x1:x2] = 0
+
+        return small
+
+    def _block_score(self, current, reference):
+        """计算最大块平均绝对差"""
+        diff = cv2.absdiff(current, reference).astype(np.float32)
+
+        # 补齐到块大小的整数倍后按块求平均
+        bs = self.block_size
+        pad_h = (-diff.shape[0]) % bs
+        pad_w = (-diff.shape[1]) % bs
+        if pad_h or pad_w:
+            diff = np.pad(diff, ((0, pad_h), (0, pad_w)), mode='edge')
+
+        blocks = diff.reshape(diff.shape[0] // bs, bs, diff.shape[1] // bs, bs)
+        return float(blocks.mean(axis=(1, 3)).max())
+
+    def check(self, image):
+        """判断画面是否需要发送，返回True表示画面已变化"""
+        self.frames_captured += 1
+        current = self._prepare(image)
+
+        if self.reference is None or self.reference.shape != current.shape:
+            self.last_score = 255.0
+        else:
+            self.last_score = self._block_score(current, self.reference)
+
+        if self.last_score < self.threshold:
+            self.frames_skipped += 1
+            return False
+
+        self.reference = current
+        self.frames_sent += 1
+        return True
+
+    def get_stats(self):
+        """获取统计信息"""
+        return {
+            'captured': self.frames_captured,
+            'skipped': self.frames_skipped,
+            'sent': self.frames_sent,
+            'last_score': self.last_score,
+        }
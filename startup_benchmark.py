@@ -0,0 +1,151 @@
+"""启动速度基准测试
+
+分别测试 main.py 和 main_enhanced.py：
+    窗口显示耗时   从启动解释器到主窗口第一次显示(Map事件)
+    就绪耗时       到后台预加载(cv2、numpy、PIL、requests、mss)完成
+    导入耗时       python -X importtime 统计的各模块导入时间(累计，含子模块)
+    启动时已加载   导入程序模块后，较慢的模块中哪些已被加载
+
+程序在 STARTUP_PROBE 环境变量下通过 startup_probe.py 输出时间点。
+每项测试都在新的子进程中运行，工作目录为临时目录，不会改动配置和缓存文件。
+窗口测试需要图形界面(Linux下可用 xvfb-run)，没有显示器时只统计导入耗时。
+PyInstaller --onefile 的解压时间不在统计范围内，可对打包后的程序另行计时。
+
+用法:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --apps main_enhanced --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = ("main", "main_enhanced")
+
+
+def run_python(args, env=None, cwd=None):
+    return subprocess.run([sys.executable] + args, capture_output=True, text=True, env=env, cwd=cwd or HERE)
+
+
+def measure_window(app, runs):
+    """窗口显示和就绪耗时(秒)，失败时返回错误信息"""
+    env = dict(os.environ, STARTUP_PROBE="1")
+    window, ready = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(runs):
+            start = time.time()
+            result = run_python([os.path.join(HERE, f"{app}.py")], env=env, cwd=tmp)
+            marks = {}
+            for line in result.stdout.splitlines():
+                if line.startswith("STARTUP "):
+                    _, name, value = line.split()
+                    marks[name] = float(value) - start
+            if "window" not in marks:
+                lines = (result.stderr or result.stdout).strip().splitlines()
+                return {"error": lines[-1] if lines else f"退出码 {result.returncode}"}
+            window.append(marks["window"])
+            ready.append(marks.get("ready", marks["window"]))
+    return {"window_ms": summarize(window), "ready_ms": summarize(ready)}
+
+
+def parse_importtime(text):
+    """解析 -X importtime 的输出，返回 [(模块, 层级, 自身微秒, 累计微秒), ...]"""
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative)))
+    return entries
+
+
+def measure_imports(app, runs, top):
+    """导入程序模块的总耗时和各模块的累计导入耗时(毫秒，取中位数)"""
+    totals, per_module = [], {}
+    for _ in range(runs):
+        result = run_python(["-X", "importtime", "-c", f"import {app}"])
+        if result.returncode:
+            lines = result.stderr.strip().splitlines()
+            return {"error": lines[-1] if lines else f"退出码 {result.returncode}"}
+        entries = parse_importtime(result.stderr)
+        # 子模块先于父模块输出，只统计程序模块之前、层级更深的连续条目（不含解释器启动时的导入）
+        index = next(i for i, entry in enumerate(entries) if entry[0] == app)
+        totals.append(entries[index][3] / 1e6)
+        for name, depth, _, cumulative in reversed(entries[:index]):
+            if depth <= entries[index][1]:
+                break
+            per_module.setdefault(name, []).append(cumulative / 1e6)
+
+    slowest = sorted(((name, statistics.median(values)) for name, values in per_module.items()),
+                     key=lambda item: item[1], reverse=True)[:top]
+    heavy = ("numpy", "cv2", "PIL.Image", "PIL.ImageTk", "requests", "mss", "pyautogui")
+    loaded = run_python(["-c", f"import sys, {app}; print(' '.join(m for m in {heavy!r} if m in sys.modules))"])
+    return {
+        "import_ms": summarize(totals),
+        "slowest_modules_ms": {name: round(value * 1000, 1) for name, value in slowest},
+        "heavy_loaded_at_import": loaded.stdout.split(),
+    }
+
+
+def summarize(values):
+    data = sorted(values)
+    return {
+        "median": round(statistics.median(data) * 1000, 1),
+        "min": round(data[0] * 1000, 1),
+        "max": round(data[-1] * 1000, 1),
+    }
+
+
+def time_call(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="启动速度基准测试")
+    parser.add_argument('--runs', type=int, default=5, help="每项测试的次数")
+    parser.add_argument('--apps', default=",".join(APPS), help="要测试的程序")
+    parser.add_argument('--top', type=int, default=10, help="列出导入最慢的模块数")
+    parser.add_argument('--output', help="结果文件（默认 benchmark_results/startup-时间.json）")
+    args = parser.parse_args(argv)
+
+    interpreter = [time_call(lambda: run_python(["-c", "pass"])) for _ in range(args.runs)]
+    print(f"解释器启动: {summarize(interpreter)['median']}ms", file=sys.stderr)
+
+    results = []
+    for app in args.apps.split(','):
+        print(f"测试 {app} ...", file=sys.stderr)
+        result = {"app": app}
+        result.update(measure_imports(app, args.runs, args.top))
+        result["window"] = measure_window(app, args.runs)
+        results.append(result)
+
+        if "import_ms" in result:
+            print(f"  导入 {result['import_ms']['median']}ms，启动时已加载: "
+                  f"{', '.join(result['heavy_loaded_at_import']) or '无'}", file=sys.stderr)
+            for name, ms in list(result["slowest_modules_ms"].items())[:5]:
+                print(f"    {name}: {ms}ms", file=sys.stderr)
+        else:
+            print(f"  导入失败: {result['error']}", file=sys.stderr)
+        window = result["window"]
+        if "error" in window:
+            print(f"  窗口测试失败: {window['error']}", file=sys.stderr)
+        else:
+            print(f"  窗口显示 {window['window_ms']['median']}ms，就绪 {window['ready_ms']['median']}ms",
+                  file=sys.stderr)
+
+    from benchmark import save_report
+    if not args.output:
+        os.makedirs("benchmark_results", exist_ok=True)
+        args.output = os.path.join("benchmark_results", time.strftime("startup-%Y%m%d-%H%M%S.json"))
+    return save_report(args, results, interpreter_ms=summarize(interpreter))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
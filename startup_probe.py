@@ -0,0 +1,25 @@
+import time
+
+
+def install_probe(root, ready, timeout=30.0):
+    """供程序在 STARTUP_PROBE 环境变量下调用：输出窗口显示和就绪的时间后退出
+
+    只依赖标准库，程序中导入它不会把基准测试代码打包进去；
+    测试本身见 startup_benchmark.py。
+    """
+    state = {"shown": False, "deadline": time.time() + timeout}
+
+    def check_ready():
+        if ready.is_set() or time.time() > state["deadline"]:
+            print(f"STARTUP ready {time.time():.6f}", flush=True)
+            root.destroy()
+        else:
+            root.after(10, check_ready)
+
+    def on_map(event):
+        if not state["shown"]:
+            state["shown"] = True
+            print(f"STARTUP window {time.time():.6f}", flush=True)
+            check_ready()
+
+    root.bind("<Map>", on_map, add="+")
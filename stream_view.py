@@ -0,0 +1,83 @@
+import threading
+import tkinter as tk
+
+from metrics import get_metrics
+
+
+class TextStreamWriter:
+    """流式文本写入器
+
+    工作线程调用 write() 追加文本，Tk 主线程按固定间隔用一次
+    root.after 批量写入控件，而不是每个token调度一次。
+    """
+
+    def __init__(self, root, widget, header="", footer="\n", interval_ms=50, on_start=None, schedule=None):
+        self.root = root
+        self.widget = widget
+        self.header = header  # 第一段文本前插入
+        self.footer = footer  # 结束时插入
+        self.interval_ms = interval_ms
+        self.on_start = on_start  # 首次写入控件前在Tk主线程中调用
+        self.schedule = schedule  # 安排在Tk主线程中调用_drain，默认按interval_ms调度
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._started = False  # 是否已插入header
+        self._finished = False
+        self._scheduled = False
+        self.has_output = False
+
+    def write(self, text):
+        """追加文本（可在任意线程调用）"""
+        if not text:
+            return
+        with self._lock:
+            if not self._started:
+                self._pending.append(self.header)
+                self._started = True
+            self._pending.append(text)
+            self.has_output = True
+        self._schedule()
+
+    def finish(self, text=""):
+        """结束输出；若尚未输出任何内容则写入text"""
+        if not self.has_output:
+            self.write(text)
+        with self._lock:
+            if self._started:
+                self._pending.append(self.footer)
+            self._finished = True
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._scheduled:
+                return
+            self._scheduled = True
+        if self.schedule:
+            self.schedule(self._drain)
+        else:
+            self.root.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        """在Tk主线程中批量写入"""
+        with self._lock:
+            text = "".join(self._pending)
+            self._pending = []
+            self._scheduled = False
+
+        if not text:
+            return
+
+        if self.on_start:
+            self.on_start()
+            self.on_start = None
+
+        with get_metrics().span("render"):
+            disabled = str(self.widget.cget('state')) == 'disabled'
+            if disabled:
+                self.widget.config(state='normal')
+            self.widget.insert(tk.END, text)
+            self.widget.see(tk.END)
+            if disabled:
+                self.widget.config(state='disabled')
@@ -0,0 +1,269 @@
+import threading
+import time
+
+from frame import to_gray
+from lazy_import import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+
+# 默认模板匹配设置，可在config.json的"trigger_scan"中覆盖
+DEFAULT_TRIGGER_SCAN_SETTINGS = {
+    "scales": [0.9, 1.0, 1.1],  # 模板的缩放比例，适应不同分辨率和UI缩放
+    "pyramid_levels": 3,   # 最多在缩小2^n倍的画面上粗匹配，再在原图上精确定位
+    "min_coarse_size": 8,  # 粗匹配模板的最短边不小于此值(像素)，否则减少缩小层数
+    "threshold": 0.8,      # 默认匹配阈值 (TM_CCOEFF_NORMED)
+    "coarse_margin": 0.15, # 粗匹配阈值比精确阈值低多少
+    "cooldown": 30.0,      # 默认触发冷却时间(秒)
+}
+
+# 触发器定义示例(config.json):
+# "trigger_profiles": {
+#     "艾尔登法环": [
+#         {"name": "Boss血条", "template": "triggers/boss_bar.png", "roi": [400, 900, 1100, 120]},
+#         {"name": "死亡", "template": "triggers/you_died.png", "threshold": 0.7, "cooldown": 60,
+#          "prompt": "玩家刚刚死亡，请分析死因并给出建议。"}
+#     ]
+# }
+
+
+def _pyr_down(image, levels):
+    for _ in range(levels):
+        image = cv2.pyrDown(image)
+    return image
+
+
+def coarse_level(template, max_levels, min_size, min_score):
+    """模板最多可缩小几层仍能被可靠地粗匹配
+
+    模板在画面中的位置一般不是2^n的整数倍，缩小后边缘还会混入周围的画面，
+    与模板自身的金字塔并不完全相同；细节多(如细笔画文字)的模板缩小太多会匹配不上。
+    这里把模板按各种错位放进随机噪点背景中再缩小，用最低的匹配得分检验每一层。
+    """
+    rng = np.random.default_rng(0)
+    height, width = template.shape[:2]
+    level = 0
+    for n in range(1, max_levels + 1):
+        small = _pyr_down(template, n)
+        if min(small.shape[:2]) < min_size:
+            break
+        border = 2 ** n
+        worst = 1.0
+        for shift in range(border):
+            offset = border + shift
+            canvas = rng.integers(0, 256, (height + 2 * border + shift, width + 2 * border + shift), dtype=np.uint8)
+            canvas[offset:offset + height, offset:offset + width] = template
+            worst = min(worst, _best_match(_pyr_down(canvas, n), small)[0])
+        if worst < min_score:
+            break
+        level = n
+    return level
+
+
+def load_gray(path):
+    """读取模板为灰度数组（支持中文路径）"""
+    with Image.open(path) as image:
+        return np.asarray(image.convert('L'))
+
+
+class Trigger:
+    """一个模板触发器"""
+
+    def __init__(self, name, template, roi=None, threshold=0.8, cooldown=30.0, prompt="",
+                 scales=(1.0,), max_levels=3, min_coarse_size=8, coarse_margin=0.15):
+        self.name = name
+        self.roi = tuple(int(v) for v in roi) if roi else None  # (x, y, w, h) 相对于截图
+        self.threshold = float(threshold)
+        self.cooldown = float(cooldown)
+        self.prompt = prompt
+        self.coarse_threshold = self.threshold - coarse_margin
+
+        # 各缩放比例的模板及其金字塔缩小版: [(原图模板, 粗匹配模板, 层数), ...]，原尺寸优先
+        self.templates = []
+        height, width = template.shape[:2]
+        for scale in sorted(scales, key=lambda s: abs(s - 1.0)):
+            size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+            if size == (width, height):
+                scaled = template
+            else:
+                scaled = cv2.resize(template, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+            level = coarse_level(scaled, max_levels, min_coarse_size, self.coarse_threshold)
+            self.templates.append((scaled, _pyr_down(scaled, level), level))
+
+        self.last_fired = 0.0
+        self.fires = 0
+        self.last_score = 0.0
+        self.roi_outside = False  # 搜索区域不在截图范围内(已提示过)
+
+    def ready(self, now):
+        return now - self.last_fired >= self.cooldown
+
+
+def _best_match(image, template):
+    """返回(最高分, 位置)，图像比模板小时返回(-1, None)"""
+    if image.shape[0] < template.shape[0] or image.shape[1] < template.shape[1]:
+        return -1.0, None
+    result = cv2.matchTemplate(image, template, cv2.TM_CCOEFF_NORMED)
+    # 纯色区域的归一化相关系数无定义
+    np.nan_to_num(result, copy=False, nan=-1.0, posinf=-1.0, neginf=-1.0)
+    _, score, _, location = cv2.minMaxLoc(result)
+    return score, location
+
+
+class _Region:
+    """一帧画面中某个搜索区域的灰度金字塔，按需逐层生成"""
+
+    def __init__(self, image, roi):
+        self.levels = []
+        if roi:
+            x, y, w, h = roi
+            box = (max(0, x), max(0, y), min(image.width, x + w), min(image.height, y + h))
+            if box[2] <= box[0] or box[3] <= box[1]:
+                # 搜索区域完全在截图之外(截图区域比配置时的分辨率小)
+                return
+            image = image.crop(box)
+        self.levels.append(to_gray(image))
+
+    @property
+    def empty(self):
+        return not self.levels
+
+    def level(self, n):
+        while len(self.levels) <= n:
+            self.levels.append(cv2.pyrDown(self.levels[-1]))
+        return self.levels[n]
+
+
+class TriggerEngine:
+    """基于模板匹配的本地事件触发
+
+    只把各触发器的搜索区域转为灰度并按需构建金字塔，在缩小的画面上
+    对各缩放比例的模板做粗匹配，得分接近阈值时再在原图的小范围内精确匹配。
+    触发的分析排入队列后由 start_cooldown() 进入冷却，冷却期间不再匹配该模板。
+    """
+
+    def __init__(self, settings=None):
+        self.settings = dict(DEFAULT_TRIGGER_SCAN_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+        self._lock = threading.Lock()
+        self.triggers = []
+        self.frames_scanned = 0
+        self.scan_time = 0.0
+        self.last_scan_ms = 0.0
+
+    def load(self, definitions):
+        """按定义加载触发器 [{'name', 'template', 'roi', 'threshold', 'cooldown', 'prompt'}, ...]"""
+        triggers = []
+        for item in definitions or []:
+            roi = item.get('roi')
+            if roi is not None and (len(roi) != 4 or int(roi[2]) <= 0 or int(roi[3]) <= 0):
+                print(f"触发器 {item.get('name') or item.get('template')} 的搜索区域无效: {roi}，应为 [x, y, 宽, 高]")
+                continue
+            try:
+                template = load_gray(item['template'])
+            except Exception as e:
+                print(f"加载触发模板失败 {item.get('template')}: {e}")
+                continue
+            triggers.append(Trigger(
+                item.get('name') or item['template'],
+                template,
+                roi=roi,
+                threshold=item.get('threshold', self.settings["threshold"]),
+                cooldown=item.get('cooldown', self.settings["cooldown"]),
+                prompt=item.get('prompt', ""),
+                scales=self.settings["scales"],
+                max_levels=int(self.settings["pyramid_levels"]),
+                min_coarse_size=int(self.settings["min_coarse_size"]),
+                coarse_margin=self.settings["coarse_margin"]
+            ))
+        with self._lock:
+            self.triggers = triggers
+        return triggers
+
+    def _match(self, trigger, region):
+        """在搜索区域中匹配一个触发器，返回最高分"""
+        gray = region.level(0)
+        best = -1.0
+        for scaled, small, level in trigger.templates:
+            if level == 0:
+                score, _ = _best_match(gray, scaled)
+            else:
+                # 在缩小的画面上粗略定位，得分过低时不再精确匹配
+                score, location = _best_match(region.level(level), small)
+                if location is not None and score >= trigger.coarse_threshold:
+                    # 在粗匹配位置附近的原图区域精确匹配
+                    factor = 2 ** level
+                    pad = factor * 2
+                    left = max(0, location[0] * factor - pad)
+                    top = max(0, location[1] * factor - pad)
+                    window = gray[top:top + scaled.shape[0] + 2 * pad, left:left + scaled.shape[1] + 2 * pad]
+                    score, _ = _best_match(window, scaled)
+            best = max(best, score)
+            if best >= trigger.threshold:
+                break
+        return best
+
+    def scan(self, image):
+        """扫描一帧画面，返回本帧触发的触发器列表"""
+        with self._lock:
+            triggers = list(self.triggers)
+        if not triggers or image is None:
+            return []
+
+        start = time.perf_counter()
+        now = time.monotonic()
+        regions = {}  # 相同搜索区域的触发器共用金字塔
+        fired = []
+        for trigger in triggers:
+            if not trigger.ready(now):
+                continue
+            if trigger.roi not in regions:
+                regions[trigger.roi] = _Region(image, trigger.roi)
+            region = regions[trigger.roi]
+            if region.empty:
+                if not trigger.roi_outside:
+                    trigger.roi_outside = True
+                    print(f"触发器 {trigger.name} 的搜索区域 {trigger.roi} 不在截图范围 "
+                          f"{image.width}x{image.height} 内，已跳过")
+                trigger.last_score = -1.0
+                continue
+            trigger.last_score = self._match(trigger, region)
+            if trigger.last_score >= trigger.threshold:
+                fired.append(trigger)
+                print(f"触发: {trigger.name} (匹配度 {trigger.last_score:.2f})")
+
+        self.last_scan_ms = (time.perf_counter() - start) * 1000
+        self.scan_time += self.last_scan_ms
+        self.frames_scanned += 1
+        return fired
+
+    @staticmethod
+    def start_cooldown(fired):
+        """触发的分析确实排入队列后调用，开始冷却并计数"""
+        now = time.monotonic()
+        for trigger in fired:
+            trigger.last_fired = now
+            trigger.fires += 1
+
+    @staticmethod
+    def build_prompt(prompt, fired):
+        """在提示词中加入触发的事件"""
+        names = "、".join(trigger.name for trigger in fired)
+        extra = "".join(f"\n{trigger.prompt}" for trigger in fired if trigger.prompt)
+        return f"{prompt}\n\n画面中刚刚出现了: {names}。请结合这一事件进行分析。{extra}"
+
+    def get_stats(self):
+        with self._lock:
+            triggers = list(self.triggers)
+        return {
+            "frames_scanned": self.frames_scanned,
+            "avg_scan_ms": self.scan_time / self.frames_scanned if self.frames_scanned else 0.0,
+            "last_scan_ms": self.last_scan_ms,
+            "triggers": {
+                t.name: {"fires": t.fires, "last_score": t.last_score} for t in triggers
+            },
+        }